@@ -1,19 +1,64 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DECIMAL, Date, Enum, ForeignKey, TIMESTAMP, func
+from sqlalchemy import create_engine, event, Column, Integer, BigInteger, String, Text, Date, Enum, ForeignKey, TIMESTAMP, Index, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy import update
+from sqlalchemy import insert, select, update, delete, and_, or_, table, column, text
 import enum
+import re
+from decimal import Decimal, ROUND_HALF_UP
+from collections import namedtuple
 from datetime import datetime, timedelta
 from termcolor import cprint
+from migrations import run_migrations
+from response_cache import TTLCache
+from config import (
+    DATABASE_URL, DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    FINANCIAL_DATA_CACHE_MAX_SIZE, FINANCIAL_DATA_CACHE_TTL, USER_ID_CACHE_MAX_SIZE, USER_ID_CACHE_TTL
+)
+
+
+def engine_options(url):
+    """Connection pool options for the configured database"""
+    if not url.startswith("sqlite"):
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT, "pool_pre_ping": True}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        return {}
+    # File databases: pooled connections shared across webhook worker threads
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "connect_args": {"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000}
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Performance profile applied to every new SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
-# Define SQLite connection string
-DATABASE_URL = "sqlite:///financial_bot.db"
 
 # Create engine and base class
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", apply_sqlite_pragmas)
 Base = declarative_base()
 SessionLocal = sessionmaker(bind=engine)
 
+# Results of get_user_financial_summary / get_user_financial_data,
+# keyed by (kind, user_id, start_date, end_date). Callers must not mutate them.
+financial_data_cache = TTLCache(max_size=FINANCIAL_DATA_CACHE_MAX_SIZE, default_ttl=FINANCIAL_DATA_CACHE_TTL)
+
+# whatsapp_number -> user_id, so known users cost no database round trip per message
+user_id_cache = TTLCache(max_size=USER_ID_CACHE_MAX_SIZE, default_ttl=USER_ID_CACHE_TTL)
+
 print("Database connection established successfully!")
 
 # Enum for transaction_type
@@ -29,6 +74,17 @@ class User(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
+# Interned category / subcategory names, referenced by id from user_interactions
+class Category(Base):
+    __tablename__ = 'categories'
+    category_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), unique=True, nullable=False)
+
+class Subcategory(Base):
+    __tablename__ = 'subcategories'
+    subcategory_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), unique=True, nullable=False)
+
 # User_Interactions table
 class UserInteraction(Base):
     __tablename__ = 'user_interactions'
@@ -36,34 +92,71 @@ class UserInteraction(Base):
     user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
     message_text = Column(Text, nullable=False)
     transaction_type = Column(Enum(TransactionType))
-    amount = Column(DECIMAL(12, 2))
-    category_name = Column(String(100))
-    subcategory_name = Column(String(100))
+    amount_paise = Column(BigInteger)
+    category_id = Column(Integer, ForeignKey('categories.category_id'))
+    subcategory_id = Column(Integer, ForeignKey('subcategories.subcategory_id'))
     transaction_date = Column(Date)
     processed_at = Column(TIMESTAMP, server_default=func.now())
+    # Transactions recorded from the same message; keyword search only trusts message_text when it is 1
+    message_transaction_count = Column(Integer, nullable=False, server_default=text("1"))
 
     user = relationship("User")
 
-# Create tables (optional)
+    __table_args__ = (
+        # History queries and reports filter by user and date range, newest first
+        Index('ix_user_interactions_user_date', 'user_id', 'transaction_date'),
+        # Category-filtered queries
+        Index('ix_user_interactions_user_category_date', 'user_id', 'category_id', 'transaction_date'),
+    )
+
+# Per-user daily and monthly totals, kept in step with user_interactions
+class InteractionRollup(Base):
+    __tablename__ = 'interaction_rollups'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    period = Column(String(5), primary_key=True)  # 'day' or 'month'
+    period_start = Column(Date, primary_key=True)
+    category_id = Column(Integer, primary_key=True)  # 0 when uncategorized
+    transaction_type = Column(Enum(TransactionType), primary_key=True)
+    total_paise = Column(BigInteger, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+ROLLUP_KEY = ('user_id', 'period', 'period_start', 'category_id', 'transaction_type')
+
+# Create tables and bring existing databases up to the latest schema version
 def create_tables():
     Base.metadata.create_all(engine)
+    return run_migrations(engine)
+
+def _insert_dialect():
+    # Both dialects support INSERT ... ON CONFLICT with the same API
+    return postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+
+def _user_upsert_statement(whatsapp_number):
+    """Create the user unless the number is already registered (safe against concurrent creates)"""
+    return (
+        _insert_dialect()(User)
+        .values(whatsapp_number=whatsapp_number)
+        .on_conflict_do_nothing(index_elements=['whatsapp_number'])
+    )
+
+def _user_id_query(whatsapp_number):
+    return select(User.user_id).where(User.whatsapp_number == whatsapp_number)
 
-# Add a new user
+# Get or create the user for a WhatsApp number
 def add_user(whatsapp_number):
+    user_id = user_id_cache.get(whatsapp_number)
+    if user_id is not None:
+        return user_id
+
     session = SessionLocal()
     try:
-        # Check if user already exists
-        existing_user = session.query(User).filter_by(whatsapp_number=whatsapp_number).first()
-        if existing_user:
-            print(f"User already exists: ID = {existing_user.user_id}")
-            return existing_user.user_id
-
-        # If not, create new user
-        user = User(whatsapp_number=whatsapp_number)
-        session.add(user)
+        created = session.execute(_user_upsert_statement(whatsapp_number)).rowcount
+        user_id = session.execute(_user_id_query(whatsapp_number)).scalar()
         session.commit()
-        print(f"New user created: ID = {user.user_id}")
-        return user.user_id
+        if created:
+            print(f"New user created: ID = {user_id}")
+        user_id_cache.set(whatsapp_number, user_id)
+        return user_id
     except Exception as e:
         session.rollback()
         print(f"Error adding user: {e}")
@@ -71,100 +164,613 @@ def add_user(whatsapp_number):
         session.close()
 
 
+def preload_user_ids(limit=None):
+    """Warm user_id_cache with the most recently active users; returns how many were loaded"""
+    limit = limit or user_id_cache.max_size
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(User.whatsapp_number, User.user_id).order_by(User.updated_at.desc()).limit(limit)
+            ).all()
+    except Exception as e:
+        print(f"Error preloading user IDs: {e}")
+        return 0
+    # Oldest first, so the most recently active users end up least likely to be evicted
+    for whatsapp_number, user_id in reversed(rows):
+        user_id_cache.set(whatsapp_number, user_id)
+    return len(rows)
+
 # Add a user interaction
 def add_interaction(user_id, message_text, transaction_type=None, amount=None,
                     category_name=None, subcategory_name=None, transaction_date=None):
+    inserted = add_interactions_batch(user_id, [{
+        'message_text': message_text,
+        'transaction_type': transaction_type,
+        'amount': amount,
+        'category_name': category_name,
+        'subcategory_name': subcategory_name,
+        'transaction_date': transaction_date
+    }])
+    if inserted:
+        print(f"Interaction added successfully for user_id {user_id}")
+
+INTERACTION_FIELDS = ('message_text', 'transaction_type', 'amount', 'category_name', 'subcategory_name', 'transaction_date')
+
+def _interaction_params(user_id, rows, from_one_message=False):
+    # Only the caller knows whether rows were split from one message; identical texts alone say nothing
+    message_transaction_count = len(rows) if from_one_message else 1
+    return [
+        {
+            'user_id': user_id,
+            **{field: row.get(field) for field in INTERACTION_FIELDS},
+            'message_transaction_count': message_transaction_count
+        }
+        for row in rows
+    ]
+
+def _to_paise(amount):
+    if amount is None:
+        return None
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def _from_paise(paise):
+    return paise / 100 if paise is not None else 0.0
+
+# (dimension model, its id column, interaction field holding the name)
+DIMENSIONS = (
+    (Category, Category.category_id, 'category_name'),
+    (Subcategory, Subcategory.subcategory_id, 'subcategory_name'),
+)
+
+# name -> id per dimension; ids never change once committed
+_dimension_ids = {Category: {}, Subcategory: {}}
+
+def _intern_statements(params):
+    """
+    For each dimension with names not yet known in this process: an upsert interning
+    them and a query reading back (name, id). Yields (model, upsert, upsert_params, query).
+    """
+    for model, id_column, field in DIMENSIONS:
+        names = sorted({row[field] for row in params if row.get(field)} - _dimension_ids[model].keys())
+        if names:
+            yield (
+                model,
+                _insert_dialect()(model).on_conflict_do_nothing(index_elements=['name']),
+                [{'name': name} for name in names],
+                select(model.name, id_column).where(model.name.in_(names))
+            )
+
+def _remember_dimension_ids(interned):
+    # Only called after commit, so a rolled-back intern never poisons the cache
+    for model, ids in interned.items():
+        _dimension_ids[model].update(ids)
+
+def _dimension_id(interned, model, name):
+    if not name:
+        return None
+    return _dimension_ids[model].get(name) or interned.get(model, {}).get(name)
+
+def _storage_rows(params, interned):
+    """Interaction params as stored: amounts in paise, names replaced by dimension ids"""
+    return [
+        {
+            'user_id': row['user_id'],
+            'message_text': row['message_text'],
+            'transaction_type': row['transaction_type'],
+            'amount_paise': _to_paise(row['amount']),
+            'category_id': _dimension_id(interned, Category, row['category_name']),
+            'subcategory_id': _dimension_id(interned, Subcategory, row['subcategory_name']),
+            'transaction_date': row['transaction_date'],
+            'message_transaction_count': row['message_transaction_count']
+        }
+        for row in params
+    ]
+
+def _interaction_write_statements(user_id, params, interned):
+    """(statement, parameters) pairs that record params for user_id; run in one transaction after interning"""
+    stored = _storage_rows(params, interned)
+    statements = [(insert(UserInteraction), stored)]
+    rollup = _rollup_statement(user_id, stored)
+    if rollup:
+        statements.append(rollup)
+    # Update user's updated_at timestamp manually
+    statements.append((update(User).where(User.user_id == user_id).values(updated_at=func.now()), None))
+    return statements
+
+# Add several interactions for one user in a single transaction
+def add_interactions_batch(user_id, rows, from_one_message=False):
+    """
+    Insert all rows (dicts with the add_interaction keyword arguments) with one
+    executemany and touch users.updated_at once. Returns the number of rows inserted.
+    Pass from_one_message=True when the rows are the transactions of a single chat message,
+    so keyword search does not credit one item with the others' amounts.
+    """
+    if not rows:
+        return 0
+
+    params = _interaction_params(user_id, rows, from_one_message)
     session = SessionLocal()
     try:
-        interaction = UserInteraction(
-            user_id=user_id,
-            message_text=message_text,
-            transaction_type=transaction_type,
-            amount=amount,
-            category_name=category_name,
-            subcategory_name=subcategory_name,
-            transaction_date=transaction_date
-        )
-        session.add(interaction)
-
-        # Update user's updated_at timestamp manually
-        session.query(User).filter(User.user_id == user_id).update(
-            {"updated_at": func.now()}
-        )
-        
+        interned = {}
+        for model, upsert, upsert_params, query in _intern_statements(params):
+            session.execute(upsert, upsert_params)
+            interned[model] = dict(session.execute(query).all())
+        for statement, statement_params in _interaction_write_statements(user_id, params, interned):
+            session.execute(statement, statement_params)
         session.commit()
-        print(f"Interaction added successfully for user_id {user_id}")
+        _remember_dimension_ids(interned)
+        invalidate_financial_data(user_id, [row.get('transaction_date') for row in params])
+        if len(params) > 1:
+            print(f"{len(params)} interactions added successfully for user_id {user_id}")
+        return len(params)
     except Exception as e:
         session.rollback()
-        print(f"Error adding interaction: {e}")
+        print(f"Error adding interactions: {e}")
+        return 0
     finally:
         session.close()
 
-def get_user_financial_data(user_id, start_date, end_date):
-    session = SessionLocal()
-    try:
-        # Convert string inputs to date objects if necessary
-        if isinstance(start_date, str):
-            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-        if isinstance(end_date, str):
-            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-
-        # Query interactions between the dates for the given user
-        interactions = (
-            session.query(UserInteraction)
-            .filter(
-                UserInteraction.user_id == user_id,
-                UserInteraction.transaction_date.between(start_date, end_date)
-            )
-            .order_by(UserInteraction.transaction_date.desc())
-            .all()
-        )
+def invalidate_financial_data(user_id, transaction_dates=None) -> int:
+    """
+    Drop cached results for user_id whose range covers any of transaction_dates
+    (every cached result for the user when no dates are given).
+    """
+    if transaction_dates is None:
+        return financial_data_cache.invalidate_where(lambda key: key[1] == user_id)
+    dates = {_to_date(value) for value in transaction_dates if value is not None}
+    return financial_data_cache.invalidate_where(
+        lambda key: key[1] == user_id and any(key[2] <= day <= key[3] for day in dates)
+    )
 
-        # Convert each row into a dictionary
-        transactions = [
-            {
-                'interaction_id': t.interaction_id,
-                'user_id': t.user_id,
-                'message_text': t.message_text,
-                'transaction_type': t.transaction_type.value if t.transaction_type else None,
-                'amount': float(t.amount) if t.amount is not None else 0.0,
-                'category_name': t.category_name,
-                'subcategory_name': t.subcategory_name,
-                'transaction_date': t.transaction_date.strftime('%Y-%m-%d') if t.transaction_date else None,
-                'processed_at': t.processed_at.strftime('%Y-%m-%d %H:%M:%S') if t.processed_at else None
+def _rollup_statement(user_id, stored):
+    """
+    Upsert adding freshly inserted (storage-format) interactions to the daily and monthly rollups,
+    as a (statement, parameters) pair, or None. Rows without a type or date never count towards totals.
+    """
+    deltas = {}
+    for row in stored:
+        transaction_type = row.get('transaction_type')
+        transaction_date = _to_date(row.get('transaction_date'))
+        if transaction_type is None or transaction_date is None:
+            continue
+        if isinstance(transaction_type, str):
+            transaction_type = TransactionType(transaction_type)
+        amount_paise = row.get('amount_paise') or 0
+        category_id = row.get('category_id') or 0
+        for period, period_start in (('day', transaction_date), ('month', transaction_date.replace(day=1))):
+            key = (period, period_start, category_id, transaction_type)
+            total, count = deltas.get(key, (0, 0))
+            deltas[key] = (total + amount_paise, count + 1)
+
+    if not deltas:
+        return None
+    upsert = _insert_dialect()(InteractionRollup)
+    return (
+        upsert.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEY),
+            set_={
+                'total_paise': InteractionRollup.total_paise + upsert.excluded.total_paise,
+                'transaction_count': InteractionRollup.transaction_count + upsert.excluded.transaction_count
             }
-            for t in interactions
+        ),
+        [
+            {'user_id': user_id, 'period': period, 'period_start': period_start, 'category_id': category_id,
+             'transaction_type': transaction_type, 'total_paise': total, 'transaction_count': count}
+            for (period, period_start, category_id, transaction_type), (total, count) in deltas.items()
         ]
+    )
 
-        # Compute totals
-        total_expenses = sum(t['amount'] for t in transactions if t['transaction_type'] == 'Debit')
-        total_income = sum(t['amount'] for t in transactions if t['transaction_type'] == 'Credit')
-
-        # Category-wise expense breakdown
-        category_totals = {}
-        for t in transactions:
-            if t['transaction_type'] == 'Debit':
-                category = t['category_name'] or "Uncategorized"
-                category_totals[category] = category_totals.get(category, 0.0) + t['amount']
-
-        # Days between
-        days = (end_date - start_date).days + 1
-
-        return {
-            'transactions': transactions,
-            'category_breakdown': category_totals,
-            'period_days': days,
-            'total_expenses': round(total_expenses, 2),
-            'total_income': round(total_income, 2)
-        }
+def rebuild_rollups(conn=None, user_id=None):
+    """
+    Recompute the rollups from user_interactions (all users, or just user_id).
+    Runs in conn's transaction when given, otherwise in a new one. Returns the number of rollup rows.
+    """
+    if conn is None:
+        with engine.begin() as conn:
+            return rebuild_rollups(conn, user_id)
+
+    clear = delete(InteractionRollup)
+    source = [
+        UserInteraction.transaction_type.is_not(None),
+        UserInteraction.transaction_date.is_not(None)
+    ]
+    if user_id is not None:
+        clear = clear.where(InteractionRollup.user_id == user_id)
+        source.append(UserInteraction.user_id == user_id)
+    conn.execute(clear)
+
+    # Daily rows straight from the interactions
+    category = func.coalesce(UserInteraction.category_id, 0)
+    daily = (
+        select(
+            UserInteraction.user_id, literal('day'), UserInteraction.transaction_date, category,
+            UserInteraction.transaction_type, func.coalesce(func.sum(UserInteraction.amount_paise), 0), func.count()
+        )
+        .where(*source)
+        .group_by(UserInteraction.user_id, UserInteraction.transaction_date, category, UserInteraction.transaction_type)
+    )
+    conn.execute(insert(InteractionRollup).from_select(
+        list(ROLLUP_KEY) + ['total_paise', 'transaction_count'], daily
+    ))
+
+    # Monthly rows folded from the daily ones (month truncation is not portable SQL)
+    daily_rows = select(
+        InteractionRollup.user_id, InteractionRollup.period_start, InteractionRollup.category_id,
+        InteractionRollup.transaction_type, InteractionRollup.total_paise, InteractionRollup.transaction_count
+    ).where(InteractionRollup.period == 'day')
+    if user_id is not None:
+        daily_rows = daily_rows.where(InteractionRollup.user_id == user_id)
+    monthly = {}
+    for row_user_id, period_start, category_id, transaction_type, total, count in conn.execute(daily_rows):
+        key = (row_user_id, period_start.replace(day=1), category_id, transaction_type)
+        month_total, month_count = monthly.get(key, (0, 0))
+        monthly[key] = (month_total + (total or 0), month_count + count)
+    if monthly:
+        conn.execute(insert(InteractionRollup), [
+            {'user_id': row_user_id, 'period': 'month', 'period_start': period_start, 'category_id': category_id,
+             'transaction_type': transaction_type, 'total_paise': total, 'transaction_count': count}
+            for (row_user_id, period_start, category_id, transaction_type), (total, count) in monthly.items()
+        ])
+
+    if user_id is None:
+        financial_data_cache.clear()
+    else:
+        invalidate_financial_data(user_id)
+    return conn.execute(select(func.count()).select_from(InteractionRollup)).scalar()
 
+def _to_date(value):
+    # Convert string inputs to date objects if necessary
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _rollup_periods(start_date, end_date):
+    """
+    Cover [start_date, end_date] with whole months plus the partial days at either end,
+    so a range needs at most ~60 daily rows per category however long it is.
+    """
+    month_from = start_date if start_date.day == 1 else _next_month(start_date)
+    month_to = _next_month(end_date) if (end_date + timedelta(days=1)).day == 1 else end_date.replace(day=1)
+    if month_from >= month_to:
+        return and_(InteractionRollup.period == 'day', InteractionRollup.period_start.between(start_date, end_date))
+    return or_(
+        and_(InteractionRollup.period == 'month',
+             InteractionRollup.period_start >= month_from, InteractionRollup.period_start < month_to),
+        and_(InteractionRollup.period == 'day',
+             InteractionRollup.period_start >= start_date, InteractionRollup.period_start < month_from),
+        and_(InteractionRollup.period == 'day',
+             InteractionRollup.period_start >= month_to, InteractionRollup.period_start <= end_date)
+    )
+
+def _category_ids(category_name):
+    """Subquery of the category id matching category_name, case-insensitively"""
+    return select(Category.category_id).where(func.lower(Category.name) == category_name.strip().lower())
+
+def _aggregate_statement(user_id, start_date, end_date, transaction_type=None, category_name=None):
+    """
+    Totals per (type, category) over the range, read from the daily/monthly rollups,
+    optionally restricted to one transaction type ('Debit'/'Credit') and/or category.
+    """
+    query = (
+        select(
+            InteractionRollup.transaction_type,
+            Category.name,
+            func.sum(InteractionRollup.total_paise),
+            func.sum(InteractionRollup.transaction_count)
+        )
+        .outerjoin(Category, Category.category_id == InteractionRollup.category_id)
+        .where(InteractionRollup.user_id == user_id, _rollup_periods(start_date, end_date))
+        .group_by(InteractionRollup.transaction_type, InteractionRollup.category_id, Category.name)
+    )
+    if transaction_type:
+        query = query.where(InteractionRollup.transaction_type == TransactionType(transaction_type))
+    if category_name:
+        query = query.where(InteractionRollup.category_id.in_(_category_ids(category_name)))
+    return query
+
+def _summarize_aggregates(rows, start_date, end_date):
+    """Turn _aggregate_statement rows into the summary dict"""
+    # Sum in integer paise and convert once, so totals are exact
+    expenses_paise = 0
+    income_paise = 0
+    category_paise = {}
+    transaction_count = 0
+    for transaction_type, category_name, paise, count in rows:
+        paise = paise or 0
+        transaction_count += count or 0
+        if transaction_type == TransactionType.Debit:
+            expenses_paise += paise
+            # Category-wise expense breakdown
+            category = category_name or "Uncategorized"
+            category_paise[category] = category_paise.get(category, 0) + paise
+        elif transaction_type == TransactionType.Credit:
+            income_paise += paise
+
+    return {
+        'category_breakdown': {category: _from_paise(paise) for category, paise in category_paise.items()},
+        'period_days': (end_date - start_date).days + 1,
+        'total_expenses': _from_paise(expenses_paise),
+        'total_income': _from_paise(income_paise),
+        'transaction_count': transaction_count
+    }
+
+def _aggregate_interactions(session, user_id, start_date, end_date, transaction_type=None, category_name=None):
+    """Totals and expense breakdown read from the daily/monthly rollups"""
+    rows = session.execute(_aggregate_statement(user_id, start_date, end_date, transaction_type, category_name)).all()
+    return _summarize_aggregates(rows, start_date, end_date)
+
+def get_user_financial_summary(user_id, start_date, end_date, transaction_type=None, category_name=None):
+    """
+    Totals and category breakdown only, without loading any transaction rows.
+    Same keys as get_user_financial_data minus 'transactions', plus 'transaction_count'.
+    transaction_type ('Debit'/'Credit') and category_name narrow the totals to matching transactions.
+    """
+    try:
+        start_date = _to_date(start_date)
+        end_date = _to_date(end_date)
+    except ValueError as e:
+        print(f"Error fetching financial summary: {e}")
+        return None
+    return financial_data_cache.get_or_load(
+        ('summary', user_id, start_date, end_date, transaction_type, category_name),
+        lambda: _load_financial_summary(user_id, start_date, end_date, transaction_type, category_name)
+    )
+
+def _load_financial_summary(user_id, start_date, end_date, transaction_type=None, category_name=None):
+    session = SessionLocal()
+    try:
+        return _aggregate_interactions(session, user_id, start_date, end_date, transaction_type, category_name)
     except Exception as e:
-        print(f"Error fetching transactions: {e}")
+        print(f"Error fetching financial summary: {e}")
         return None
     finally:
         session.close()
 
+# Lightweight row yielded by iter_user_transactions (no ORM identity map, no per-row dicts)
+TransactionRow = namedtuple(
+    'TransactionRow',
+    ('interaction_id', 'transaction_date', 'transaction_type', 'amount', 'category_name', 'subcategory_name')
+)
+
+TRANSACTION_PAGE_SIZE = 500
+
+TRANSACTION_ROW_COLUMNS = (
+    UserInteraction.transaction_type, UserInteraction.amount_paise, Category.name, Subcategory.name
+)
+TRANSACTION_DETAIL_COLUMNS = (
+    UserInteraction.message_text, UserInteraction.transaction_type, UserInteraction.amount_paise,
+    Category.name, Subcategory.name, UserInteraction.processed_at
+)
+
+def _interaction_filters(transaction_type=None, category_name=None):
+    """Optional WHERE clauses restricting interactions to one type and/or category"""
+    filters = []
+    if transaction_type:
+        filters.append(UserInteraction.transaction_type == TransactionType(transaction_type))
+    if category_name:
+        filters.append(UserInteraction.category_id.in_(_category_ids(category_name)))
+    return filters
+
+def _transactions_query(user_id, start_date, end_date, columns, filters=()):
+    """A user's transactions between the dates, with category/subcategory names joined in"""
+    return (
+        select(UserInteraction.transaction_date, UserInteraction.interaction_id, *columns)
+        .outerjoin(Category, Category.category_id == UserInteraction.category_id)
+        .outerjoin(Subcategory, Subcategory.subcategory_id == UserInteraction.subcategory_id)
+        .where(
+            UserInteraction.user_id == user_id,
+            UserInteraction.transaction_date.between(start_date, end_date),
+            *filters
+        )
+    )
+
+def _transaction_page_query(user_id, start_date, end_date, columns, page_size, after=None, filters=()):
+    """
+    One page of a user's transactions newest first, keyset-paginated on
+    (transaction_date, interaction_id); after is the (date, id) of the previous page's last row.
+    Every selected row starts with those two columns.
+    """
+    query = (
+        _transactions_query(user_id, start_date, end_date, columns, filters)
+        .order_by(UserInteraction.transaction_date.desc(), UserInteraction.interaction_id.desc())
+        .limit(page_size)
+    )
+    if after is not None:
+        last_date, last_id = after
+        # Continue strictly after the last row of the previous page
+        query = query.where(or_(
+            UserInteraction.transaction_date < last_date,
+            and_(UserInteraction.transaction_date == last_date, UserInteraction.interaction_id < last_id)
+        ))
+    return query
 
+def _largest_transactions_statement(user_id, start_date, end_date, limit, filters=()):
+    """Top-N transactions by amount"""
+    return (
+        _transactions_query(user_id, start_date, end_date, TRANSACTION_ROW_COLUMNS, filters)
+        .order_by(UserInteraction.amount_paise.desc(), UserInteraction.interaction_id.desc())
+        .limit(limit)
+    )
+
+def _transaction_pages(user_id, start_date, end_date, columns, page_size=TRANSACTION_PAGE_SIZE, filters=()):
+    """
+    Yield raw result rows page by page. A connection is only held while a page is being fetched.
+    """
+    start_date = _to_date(start_date)
+    end_date = _to_date(end_date)
+    after = None
+    while True:
+        with engine.connect() as conn:
+            page = conn.execute(
+                _transaction_page_query(user_id, start_date, end_date, columns, page_size, after, filters)
+            ).all()
+        yield from page
+        if len(page) < page_size:
+            return
+        after = (page[-1][0], page[-1][1])
+
+def _transaction_row(row):
+    transaction_date, interaction_id, transaction_type, amount_paise, category_name, subcategory_name = row
+    return TransactionRow(
+        interaction_id,
+        transaction_date,
+        transaction_type.value if transaction_type else None,
+        _from_paise(amount_paise),
+        category_name,
+        subcategory_name
+    )
+
+def _transaction_dict(user_id, row):
+    transaction_date, interaction_id, message_text, transaction_type, amount_paise, category_name, subcategory_name, processed_at = row
+    return {
+        'interaction_id': interaction_id,
+        'user_id': user_id,
+        'message_text': message_text,
+        'transaction_type': transaction_type.value if transaction_type else None,
+        'amount': _from_paise(amount_paise),
+        'category_name': category_name,
+        'subcategory_name': subcategory_name,
+        'transaction_date': transaction_date.strftime('%Y-%m-%d') if transaction_date else None,
+        'processed_at': processed_at.strftime('%Y-%m-%d %H:%M:%S') if processed_at else None
+    }
+
+def _financial_data(transactions, summary):
+    return {
+        'transactions': transactions,
+        'category_breakdown': summary['category_breakdown'],
+        'period_days': summary['period_days'],
+        'total_expenses': summary['total_expenses'],
+        'total_income': summary['total_income']
+    }
+
+def iter_user_transactions(user_id, start_date, end_date, page_size=TRANSACTION_PAGE_SIZE,
+                           transaction_type=None, category_name=None):
+    """
+    Stream a user's transactions between the dates as TransactionRow tuples, newest first.
+    Memory use is bounded by page_size however much history the user has.
+    """
+    filters = _interaction_filters(transaction_type, category_name)
+    for row in _transaction_pages(user_id, start_date, end_date, TRANSACTION_ROW_COLUMNS, page_size, filters):
+        yield _transaction_row(row)
+
+def get_largest_transactions(user_id, start_date, end_date, transaction_type=None, category_name=None, limit=5):
+    """The limit largest transactions between the dates as TransactionRow tuples; None on error"""
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(_largest_transactions_statement(
+                user_id, _to_date(start_date), _to_date(end_date), limit,
+                _interaction_filters(transaction_type, category_name)
+            )).all()
+        return [_transaction_row(row) for row in rows]
+    except Exception as e:
+        print(f"Error fetching largest transactions: {e}")
+        return None
+
+SEARCH_RESULT_LIMIT = 1000
+
+# FTS5 index over message_text and subcategory names, kept in sync by triggers (migration 4)
+interaction_search = table('interaction_search', column('rowid'))
+
+def _fts_query(search_text):
+    """Every word must match, as a prefix ("starbuck" also finds "Starbucks")"""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", search_text.lower()))
+
+def _search_statement(user_id, search_text, start_date, end_date, limit, filters=()):
+    """
+    Matching transactions newest first; FTS5 on SQLite, case-insensitive LIKE elsewhere.
+    A transaction matches on its own subcategory, or on its message only when that message recorded
+    nothing else - "spent 200 on starbucks and 80 on auto" must not count the auto ride as Starbucks.
+    """
+    query = _transaction_page_query(user_id, start_date, end_date, TRANSACTION_ROW_COLUMNS, limit, filters=filters)
+    own_message = UserInteraction.message_transaction_count == 1
+    if engine.dialect.name == "sqlite":
+        fts_query = _fts_query(search_text)
+        subcategory_matches = select(interaction_search.c.rowid).where(
+            text("interaction_search MATCH :subcategory_query").bindparams(subcategory_query=f"subcategory_name : ({fts_query})")
+        )
+        matches = select(interaction_search.c.rowid).where(
+            text("interaction_search MATCH :fts_query").bindparams(fts_query=fts_query)
+        )
+        return query.where(or_(
+            UserInteraction.interaction_id.in_(subcategory_matches),
+            and_(own_message, UserInteraction.interaction_id.in_(matches))
+        ))
+    pattern = f"%{search_text.strip()}%"
+    return query.where(or_(Subcategory.name.ilike(pattern), and_(own_message, UserInteraction.message_text.ilike(pattern))))
+
+def search_user_transactions(user_id, search_text, start_date, end_date, limit=SEARCH_RESULT_LIMIT,
+                             transaction_type=None, category_name=None):
+    """
+    Transactions between the dates whose message or subcategory mentions search_text,
+    as TransactionRow tuples newest first (at most limit). Returns None on error.
+    """
+    if not re.search(r"\w", search_text or ""):
+        return []
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                _search_statement(user_id, search_text, _to_date(start_date), _to_date(end_date), limit,
+                                  _interaction_filters(transaction_type, category_name))
+            ).all()
+        return [_transaction_row(row) for row in rows]
+    except Exception as e:
+        print(f"Error searching transactions: {e}")
+        return None
+
+def summarize_transaction_rows(rows, start_date, end_date):
+    """Summary dict (same keys as get_user_financial_summary) for a list of TransactionRow"""
+    start_date = _to_date(start_date)
+    end_date = _to_date(end_date)
+    total_expenses = 0.0
+    total_income = 0.0
+    category_totals = {}
+    for row in rows:
+        if row.transaction_type == 'Debit':
+            total_expenses += row.amount
+            category = row.category_name or "Uncategorized"
+            category_totals[category] = round(category_totals.get(category, 0.0) + row.amount, 2)
+        elif row.transaction_type == 'Credit':
+            total_income += row.amount
+    return {
+        'category_breakdown': category_totals,
+        'period_days': (end_date - start_date).days + 1,
+        'total_expenses': round(total_expenses, 2),
+        'total_income': round(total_income, 2),
+        'transaction_count': len(rows)
+    }
+
+def get_user_financial_data(user_id, start_date, end_date):
+    try:
+        start_date = _to_date(start_date)
+        end_date = _to_date(end_date)
+    except ValueError as e:
+        print(f"Error fetching transactions: {e}")
+        return None
+    return financial_data_cache.get_or_load(
+        ('data', user_id, start_date, end_date),
+        lambda: _load_financial_data(user_id, start_date, end_date)
+    )
+
+def _load_financial_data(user_id, start_date, end_date):
+    try:
+        # Build the per-row dicts straight from paged Core rows, without hydrating ORM objects
+        transactions = [
+            _transaction_dict(user_id, row)
+            for row in _transaction_pages(user_id, start_date, end_date, TRANSACTION_DETAIL_COLUMNS)
+        ]
+
+        # Totals and breakdown come from SQL rather than extra passes over the rows
+        summary = get_user_financial_summary(user_id, start_date, end_date)
+        if summary is None:
+            return None
+        return _financial_data(transactions, summary)
+
+    except Exception as e:
+        print(f"Error fetching transactions: {e}")
+        return None
 
 
 # Example usage
@@ -0,0 +1,225 @@
+"""
+Async counterparts of the database helpers for the FastAPI request path
+
+Built on SQLAlchemy's asyncio extension with aiosqlite, so database work on the
+webhook path never blocks the event loop. Statements, row mapping and caching are
+shared with add_data_in_database; only the execution is async.
+
+Wrap the handling of one message in message_session() to run all of its queries
+on one AsyncSession; outside of it every helper opens a short-lived session.
+"""
+
+import re
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from config import DATABASE_URL
+from add_data_in_database import (
+    engine_options, apply_sqlite_pragmas, financial_data_cache, invalidate_financial_data, user_id_cache,
+    _user_upsert_statement, _user_id_query, TRANSACTION_PAGE_SIZE, TRANSACTION_ROW_COLUMNS, TRANSACTION_DETAIL_COLUMNS,
+    _to_date, _interaction_params, _intern_statements, _remember_dimension_ids, _interaction_write_statements,
+    _aggregate_statement, _summarize_aggregates, _transaction_page_query, _transaction_row, _transaction_dict,
+    _financial_data, _search_statement, SEARCH_RESULT_LIMIT, _interaction_filters, _largest_transactions_statement
+)
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """Swap the sync driver in a DATABASE_URL for its async equivalent"""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}://{rest}"
+
+
+async_engine = create_async_engine(async_database_url(DATABASE_URL), **engine_options(DATABASE_URL))
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+_message_session = ContextVar("message_session", default=None)
+
+
+@asynccontextmanager
+async def message_session():
+    """Scope one AsyncSession to the handling of a single message (its queries run one at a time)"""
+    async with AsyncSessionLocal() as session:
+        token = _message_session.set(session)
+        try:
+            yield session
+        finally:
+            _message_session.reset(token)
+
+
+@asynccontextmanager
+async def _transaction():
+    """Run one unit of work on the message's session (or a fresh one) and commit it"""
+    session = _message_session.get()
+    if session is None:
+        async with AsyncSessionLocal() as session, session.begin():
+            yield session
+    else:
+        async with session.begin():
+            yield session
+
+
+async def aadd_user(whatsapp_number):
+    """Async version of add_user"""
+    user_id = user_id_cache.get(whatsapp_number)
+    if user_id is not None:
+        return user_id
+
+    try:
+        async with _transaction() as session:
+            created = (await session.execute(_user_upsert_statement(whatsapp_number))).rowcount
+            user_id = (await session.execute(_user_id_query(whatsapp_number))).scalar()
+        if created:
+            print(f"New user created: ID = {user_id}")
+        user_id_cache.set(whatsapp_number, user_id)
+        return user_id
+    except Exception as e:
+        print(f"Error adding user: {e}")
+        return None
+
+
+async def aadd_interactions_batch(user_id, rows, from_one_message=False):
+    """Async version of add_interactions_batch"""
+    if not rows:
+        return 0
+
+    params = _interaction_params(user_id, rows, from_one_message)
+    try:
+        async with _transaction() as session:
+            interned = {}
+            for model, upsert, upsert_params, query in _intern_statements(params):
+                await session.execute(upsert, upsert_params)
+                interned[model] = dict((await session.execute(query)).all())
+            for statement, statement_params in _interaction_write_statements(user_id, params, interned):
+                await session.execute(statement, statement_params)
+    except Exception as e:
+        print(f"Error adding interactions: {e}")
+        return 0
+
+    _remember_dimension_ids(interned)
+
+    invalidate_financial_data(user_id, [row.get('transaction_date') for row in params])
+    if len(params) > 1:
+        print(f"{len(params)} interactions added successfully for user_id {user_id}")
+    return len(params)
+
+
+async def _aload_financial_summary(user_id, start_date, end_date, transaction_type=None, category_name=None):
+    try:
+        async with _transaction() as session:
+            rows = (await session.execute(
+                _aggregate_statement(user_id, start_date, end_date, transaction_type, category_name)
+            )).all()
+        return _summarize_aggregates(rows, start_date, end_date)
+    except Exception as e:
+        print(f"Error fetching financial summary: {e}")
+        return None
+
+
+async def aget_user_financial_summary(user_id, start_date, end_date, transaction_type=None, category_name=None):
+    """Async version of get_user_financial_summary; concurrent misses share one query"""
+    try:
+        start_date = _to_date(start_date)
+        end_date = _to_date(end_date)
+    except ValueError as e:
+        print(f"Error fetching financial summary: {e}")
+        return None
+    return await financial_data_cache.aget_or_load(
+        ('summary', user_id, start_date, end_date, transaction_type, category_name),
+        lambda: _aload_financial_summary(user_id, start_date, end_date, transaction_type, category_name)
+    )
+
+
+async def _atransaction_pages(user_id, start_date, end_date, columns, page_size=TRANSACTION_PAGE_SIZE, filters=()):
+    start_date = _to_date(start_date)
+    end_date = _to_date(end_date)
+    after = None
+    while True:
+        async with _transaction() as session:
+            page = (await session.execute(
+                _transaction_page_query(user_id, start_date, end_date, columns, page_size, after, filters)
+            )).all()
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        after = (page[-1][0], page[-1][1])
+
+
+async def aiter_user_transactions(user_id, start_date, end_date, page_size=TRANSACTION_PAGE_SIZE,
+                                  transaction_type=None, category_name=None):
+    """Async version of iter_user_transactions"""
+    filters = _interaction_filters(transaction_type, category_name)
+    async for row in _atransaction_pages(user_id, start_date, end_date, TRANSACTION_ROW_COLUMNS, page_size, filters):
+        yield _transaction_row(row)
+
+
+async def aget_largest_transactions(user_id, start_date, end_date, transaction_type=None, category_name=None, limit=5):
+    """Async version of get_largest_transactions"""
+    try:
+        async with _transaction() as session:
+            rows = (await session.execute(_largest_transactions_statement(
+                user_id, _to_date(start_date), _to_date(end_date), limit,
+                _interaction_filters(transaction_type, category_name)
+            ))).all()
+        return [_transaction_row(row) for row in rows]
+    except Exception as e:
+        print(f"Error fetching largest transactions: {e}")
+        return None
+
+
+async def asearch_user_transactions(user_id, search_text, start_date, end_date, limit=SEARCH_RESULT_LIMIT,
+                                    transaction_type=None, category_name=None):
+    """Async version of search_user_transactions"""
+    if not re.search(r"\w", search_text or ""):
+        return []
+    try:
+        async with _transaction() as session:
+            rows = (await session.execute(
+                _search_statement(user_id, search_text, _to_date(start_date), _to_date(end_date), limit,
+                                  _interaction_filters(transaction_type, category_name))
+            )).all()
+        return [_transaction_row(row) for row in rows]
+    except Exception as e:
+        print(f"Error searching transactions: {e}")
+        return None
+
+
+async def _aload_financial_data(user_id, start_date, end_date):
+    try:
+        transactions = [
+            _transaction_dict(user_id, row)
+            async for row in _atransaction_pages(user_id, start_date, end_date, TRANSACTION_DETAIL_COLUMNS)
+        ]
+        summary = await aget_user_financial_summary(user_id, start_date, end_date)
+        if summary is None:
+            return None
+        return _financial_data(transactions, summary)
+    except Exception as e:
+        print(f"Error fetching transactions: {e}")
+        return None
+
+
+async def aget_user_financial_data(user_id, start_date, end_date):
+    """Async version of get_user_financial_data"""
+    try:
+        start_date = _to_date(start_date)
+        end_date = _to_date(end_date)
+    except ValueError as e:
+        print(f"Error fetching transactions: {e}")
+        return None
+    return await financial_data_cache.aget_or_load(
+        ('data', user_id, start_date, end_date),
+        lambda: _aload_financial_data(user_id, start_date, end_date)
+    )
+
+
+async def dispose():
+    await async_engine.dispose()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt sizes for the financial data embedded in report prompts
+
+Generates synthetic histories shaped like get_user_financial_data output and compares
+the old json.dumps(indent=2) payload with the compact pipe-delimited encoding, before
+any token budget is applied. No database needed.
+
+Token counts come from Gemini's count_tokens when GEMINI_API_KEY is set. Without a key
+the columns fall back to the prompt builder's chars/4 estimate, which only follows the
+byte counts and cannot show how differently JSON whitespace and delimited rows tokenize.
+
+Usage: python benchmark_prompt_encoding.py [rows ...]
+"""
+
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+from config import GEMINI_MODEL
+from prompt_builder import PromptBuilder, add_financial_data, estimate_tokens
+
+CATEGORIES = {
+    "Food": ["Groceries", "Coffee", "Restaurant", "Swiggy"],
+    "Transport": ["Uber", "Metro", "Petrol", "Auto"],
+    "Shopping": ["Amazon", "Clothes", "Electronics"],
+    "Entertainment": ["Netflix", "Movies", "Concert"],
+    "Utilities": ["Electricity", "Internet", "Mobile recharge"],
+    "Income": ["Salary", "Freelance", "Refund"],
+}
+
+
+def generate_history(rows: int, seed: int = 42) -> dict:
+    """A get_user_financial_data-style dict with rows random transactions"""
+    rng = random.Random(seed)
+    today = date(2025, 1, 31)
+    transactions = []
+    breakdown = {}
+    total_expenses = total_income = 0.0
+    for interaction_id in range(1, rows + 1):
+        category = rng.choice(list(CATEGORIES))
+        subcategory = rng.choice(CATEGORIES[category])
+        credit = category == "Income"
+        amount = round(rng.uniform(5000, 80000) if credit else rng.uniform(20, 5000), 2)
+        transaction_date = today - timedelta(days=rng.randrange(90))
+        transactions.append({
+            'interaction_id': interaction_id,
+            'user_id': 1,
+            'message_text': f"{'got' if credit else 'spent'} {amount} on {subcategory.lower()}",
+            'transaction_type': "Credit" if credit else "Debit",
+            'amount': amount,
+            'category_name': category,
+            'subcategory_name': subcategory,
+            'transaction_date': transaction_date.strftime('%Y-%m-%d'),
+            'processed_at': f"{transaction_date} 12:00:00",
+        })
+        if credit:
+            total_income += amount
+        else:
+            total_expenses += amount
+            breakdown[category] = breakdown.get(category, 0) + amount
+    return {
+        'transactions': transactions,
+        'category_breakdown': {name: round(amount, 2) for name, amount in breakdown.items()},
+        'period_days': 90,
+        'total_expenses': round(total_expenses, 2),
+        'total_income': round(total_income, 2),
+    }
+
+
+def compact_payload(data: dict) -> str:
+    # Unbounded budget so both encodings carry every row
+    return add_financial_data(PromptBuilder("benchmark", budget=sys.maxsize), data).build()
+
+
+def gemini_token_counter():
+    """Token counter backed by Gemini's count_tokens, or None without GEMINI_API_KEY"""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    return lambda text: model.count_tokens(text).total_tokens
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 5000]
+    count_tokens = gemini_token_counter()
+    if count_tokens:
+        tokens_label = "tokens"
+        print(f"Tokens counted by {GEMINI_MODEL}")
+    else:
+        count_tokens, tokens_label = estimate_tokens, "est. tokens"
+        print("GEMINI_API_KEY not set: token columns are chars/4 estimates, not tokenizer counts")
+
+    print(f"{'rows':>6} | {'json bytes':>11} | {'json ' + tokens_label:>16} | {'compact bytes':>13} | "
+          f"{'compact ' + tokens_label:>19} | {'saved':>6}")
+    for rows in sizes:
+        data = generate_history(rows)
+        legacy = json.dumps(data, indent=2, default=str)
+        compact = compact_payload(data)
+        legacy_bytes, compact_bytes = len(legacy.encode()), len(compact.encode())
+        legacy_tokens, compact_tokens = count_tokens(legacy), count_tokens(compact)
+        print(f"{rows:>6} | {legacy_bytes:>11,} | {legacy_tokens:>16,} | {compact_bytes:>13,} | "
+              f"{compact_tokens:>19,} | {1 - compact_tokens / legacy_tokens:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
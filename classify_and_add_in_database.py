@@ -13,7 +13,7 @@ from termcolor import cprint
 from csv_operation import read_queries, write_response
 
 # Import database functions
-from add_data_in_database import add_user, add_interaction, TransactionType
+from add_data_in_database import add_user, add_interaction, add_interactions_batch, TransactionType
 
 
 class GeminiChat:
@@ -116,6 +116,7 @@ No markdown, no explanation.
         # Process based on intent
         if "transaction" in ai_response:
             transactions = ai_response["transaction"]
+            rows = []
             for transaction in transactions:
                 # Convert transaction_type string to enum
                 transaction_type_enum = None
@@ -135,16 +136,17 @@ No markdown, no explanation.
                     except ValueError:
                         print(f"Invalid date format: {transaction['transaction_date']}")
 
-                # Store interaction in database
-                add_interaction(
-                    user_id=user_id,
-                    message_text=user_message,
-                    transaction_type=transaction_type_enum,
-                    amount=transaction.get("amount"),
-                    category_name=transaction.get("category_name"),
-                    subcategory_name=transaction.get("subcategory_name"),
-                    transaction_date=transaction_date
-                )
+                rows.append({
+                    "message_text": user_message,
+                    "transaction_type": transaction_type_enum,
+                    "amount": transaction.get("amount"),
+                    "category_name": transaction.get("category_name"),
+                    "subcategory_name": transaction.get("subcategory_name"),
+                    "transaction_date": transaction_date
+                })
+
+            # Store all interactions from this message in one database transaction
+            add_interactions_batch(user_id, rows, from_one_message=True)
             
             return f"Stored {len(transactions)} transaction(s) successfully!"
         
@@ -1,6 +1,89 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
 # --- Whats up webhook ---
+# Background workers that process webhook messages after the POST is acknowledged.
+# Each worker serves one user at a time, so WEBHOOK_WORKERS is also the max users in flight.
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+WEBHOOK_QUEUE_MAXSIZE = int(os.getenv("WEBHOOK_QUEUE_MAXSIZE", 1000))
+# Fairness: messages handled per user before yielding, and max messages queued per user
+WEBHOOK_JOBS_PER_TURN = int(os.getenv("WEBHOOK_JOBS_PER_TURN", 1))
+WEBHOOK_MAX_PENDING_PER_USER = int(os.getenv("WEBHOOK_MAX_PENDING_PER_USER", 50))
+
+# Conversation state backend: "memory" (single process) or "sqlite" (shared by all uvicorn workers).
+# Defaults to sqlite when running more than one worker.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite" if WEB_CONCURRENCY > 1 else "memory")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "bot_state.db")
+# MessageQueue only orders one user's messages within a process. With several workers the sqlite backend
+# also holds a per-user lease row while a message is handled, so the same user's messages never overlap
+# across processes; two messages arriving at different workers at the same moment may still run in either order.
+# A lease left by a crashed worker expires after STATE_LEASE_TTL seconds.
+STATE_LEASE_TTL = float(os.getenv("STATE_LEASE_TTL", 120))
+CHAT_HISTORY_LENGTH = int(os.getenv("CHAT_HISTORY_LENGTH", 20))
+# Memory backend bounds: conversations idle this long (seconds) are dropped, least recently used beyond the caps
+CHAT_STORE_MAX_USERS = int(os.getenv("CHAT_STORE_MAX_USERS", 10000))
+CHAT_STORE_IDLE_TTL = float(os.getenv("CHAT_STORE_IDLE_TTL", 86400))
+CHAT_STORE_MAX_BYTES = int(os.getenv("CHAT_STORE_MAX_BYTES", 67108864))
+
+# Processed message IDs remembered for deduplication; set DEDUP_DB_PATH to persist across restarts
+DEDUP_MAX_SIZE = int(os.getenv("DEDUP_MAX_SIZE", 50000))
+DEDUP_TTL_SECONDS = float(os.getenv("DEDUP_TTL_SECONDS", 86400))
+DEDUP_DB_PATH = os.getenv("DEDUP_DB_PATH", "")
+
+# Shared async HTTP client for gate.whapi.cloud (seconds / connection counts)
+WHAPI_TIMEOUT = float(os.getenv("WHAPI_TIMEOUT", 10))
+WHAPI_CONNECT_TIMEOUT = float(os.getenv("WHAPI_CONNECT_TIMEOUT", 5))
+WHAPI_TYPING_TIMEOUT = float(os.getenv("WHAPI_TYPING_TIMEOUT", 3))
+WHAPI_MAX_CONNECTIONS = int(os.getenv("WHAPI_MAX_CONNECTIONS", 50))
+WHAPI_MAX_KEEPALIVE = int(os.getenv("WHAPI_MAX_KEEPALIVE", 20))
+WHAPI_KEEPALIVE_EXPIRY = float(os.getenv("WHAPI_KEEPALIVE_EXPIRY", 30))
+
+
+# --- Database ---
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///financial_bot.db")
+# SQLite performance profile: WAL lets readers run alongside a writer, busy timeout waits out locks
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 20000))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 268435456))
+# Pool sized for concurrent webhook workers
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Recent financial-data results per user (TTL in seconds). Writes invalidate them only in the writing process,
+# so the cache is off with more than one worker - another worker could otherwise answer from stale totals
+FINANCIAL_DATA_CACHE_MAX_SIZE = int(os.getenv("FINANCIAL_DATA_CACHE_MAX_SIZE", 5000))
+FINANCIAL_DATA_CACHE_TTL = float(os.getenv("FINANCIAL_DATA_CACHE_TTL", 60)) if WEB_CONCURRENCY == 1 else 0.0
+# WhatsApp number -> user_id mappings never change; preload fills the cache with the most recently active users at startup
+USER_ID_CACHE_MAX_SIZE = int(os.getenv("USER_ID_CACHE_MAX_SIZE", 100000))
+USER_ID_CACHE_TTL = float(os.getenv("USER_ID_CACHE_TTL", 86400))
+USER_ID_CACHE_PRELOAD = os.getenv("USER_ID_CACHE_PRELOAD", "false").lower() == "true"
 
 
 # --- LLM ---
 # GEMINI_MODEL = "gemini-2.0-flash"
 GEMINI_MODEL = "gemini-2.0-flash"
+
+# Rule-based fast path ahead of the Gemini intent classifier
+FAST_INTENT_ENABLED = os.getenv("FAST_INTENT_ENABLED", "true").lower() == "true"
+FAST_INTENT_MIN_CONFIDENCE = float(os.getenv("FAST_INTENT_MIN_CONFIDENCE", 0.85))
+
+# Classifier returns the transaction acknowledgement too (one Gemini call per transaction message)
+TRANSACTION_SINGLE_CALL = os.getenv("TRANSACTION_SINGLE_CALL", "true").lower() == "true"
+
+# financial_info answers are cached per normalized query; live rates expire sooner than definitions (seconds)
+SEARCH_CACHE_MAX_SIZE = int(os.getenv("SEARCH_CACHE_MAX_SIZE", 2000))
+SEARCH_CACHE_RATES_TTL = float(os.getenv("SEARCH_CACHE_RATES_TTL", 900))
+SEARCH_CACHE_DEFINITION_TTL = float(os.getenv("SEARCH_CACHE_DEFINITION_TTL", 86400))
+
+# History answers stream transactions and put at most this many of the newest rows in the prompt
+HISTORY_MAX_ROWS = int(os.getenv("HISTORY_MAX_ROWS", 100))
+
+# Estimated-token ceilings per prompt (~4 characters per token); data rows beyond them are left out
+PROMPT_TOKEN_BUDGET_CLASSIFIER = int(os.getenv("PROMPT_TOKEN_BUDGET_CLASSIFIER", 3000))
+PROMPT_TOKEN_BUDGET_HISTORY = int(os.getenv("PROMPT_TOKEN_BUDGET_HISTORY", 4000))
+PROMPT_TOKEN_BUDGET_REPORT = int(os.getenv("PROMPT_TOKEN_BUDGET_REPORT", 8000))
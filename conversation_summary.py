@@ -0,0 +1,102 @@
+"""
+Rolling per-user conversation summary
+
+Instead of pasting recent messages into every prompt, the bot keeps a small dict per
+user, updated after each turn from what it already has - the classified intent, the
+date range and category asked about and the key figures of the answer - and renders
+it as a few fixed lines. Prompt size stays the same however long the conversation runs.
+"""
+
+MESSAGE_EXCERPT_CHARS = 120
+REPLY_EXCERPT_CHARS = 200
+RECORDED_TRANSACTIONS_SHOWN = 3
+
+
+def _excerpt(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def update_conversation_summary(summary: dict, user_message: str, classification: dict, response: str,
+                                facts: dict = None) -> dict:
+    """
+    Fold one turn into the summary and return the new summary.
+    facts are the key figures of a transaction_history answer (see EnhancedFinancialBot._history_facts).
+    Topic entries (last history question, last recorded transactions, last search) are kept until
+    replaced, so "what about last month?" still has something to refer to after small talk.
+    """
+    summary = dict(summary or {})
+    classification = classification or {}
+    intent = classification.get("intent") or "unknown"
+
+    summary["turns"] = summary.get("turns", 0) + 1
+    summary["last_intent"] = intent
+    summary["last_message"] = _excerpt(user_message, MESSAGE_EXCERPT_CHARS)
+    summary["last_reply"] = _excerpt(response, REPLY_EXCERPT_CHARS)
+
+    if intent == "transaction_history":
+        summary["history"] = {
+            "query_type": classification.get("query_type"),
+            "category": classification.get("category_filter"),
+            "search_text": classification.get("search_text"),
+            **(facts or {}),
+        }
+    elif intent == "transaction":
+        summary["recorded"] = [
+            {
+                "transaction_type": transaction.get("transaction_type"),
+                "amount": transaction.get("amount"),
+                "category": transaction.get("category_name"),
+                "item": transaction.get("subcategory_name"),
+                "date": transaction.get("transaction_date"),
+            }
+            for transaction in (classification.get("transactions") or [])[:RECORDED_TRANSACTIONS_SHOWN]
+        ]
+    elif intent == "financial_info":
+        summary["search_query"] = _excerpt(classification.get("search_query") or user_message, MESSAGE_EXCERPT_CHARS)
+
+    return summary
+
+
+def format_conversation_summary(summary: dict) -> str:
+    """Render the summary as prompt lines; empty string for a new conversation"""
+    if not summary:
+        return ""
+
+    lines = [
+        f"- Turns so far: {summary.get('turns', 0)}",
+        f"- Last intent: {summary.get('last_intent')}",
+        f"- Last user message: \"{summary.get('last_message', '')}\"",
+        f"- Last reply (excerpt): \"{summary.get('last_reply', '')}\"",
+    ]
+
+    history = summary.get("history")
+    if history:
+        question = history.get("query_type") or "general"
+        if history.get("start_date"):
+            question += f", {history['start_date']} to {history.get('end_date')}"
+        if history.get("category"):
+            question += f", category {history['category']}"
+        if history.get("search_text"):
+            question += f", mentioning \"{history['search_text']}\""
+        lines.append(f"- Last history question: {question}")
+        if history.get("transaction_count") is not None:
+            lines.append(
+                f"- Its figures: {history['transaction_count']} transactions, "
+                f"expenses ₹{round(history.get('total_expenses') or 0)}, income ₹{round(history.get('total_income') or 0)}"
+                + (f", top expense category {history['top_category']}" if history.get("top_category") else "")
+            )
+
+    recorded = summary.get("recorded")
+    if recorded:
+        entries = ", ".join(
+            f"{'+' if entry['transaction_type'] == 'Credit' else '-'}₹{entry['amount']} {entry['category'] or ''}"
+            f"{' (' + entry['item'] + ')' if entry.get('item') else ''}"
+            for entry in recorded
+        )
+        lines.append(f"- Last recorded: {entries}")
+
+    if summary.get("search_query"):
+        lines.append(f"- Last web search: \"{summary['search_query']}\"")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,138 @@
+"""
+Bounded TTL/LRU store of processed WhatsApp message IDs
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MessageDeduplicator:
+    """
+    Remembers recently processed message IDs so whapi redeliveries are skipped.
+
+    IDs expire after ttl_seconds and at most max_size IDs are kept in memory
+    (oldest evicted first). With db_path set, IDs are also written to a SQLite
+    table so deduplication survives restarts.
+    """
+
+    def __init__(self, max_size: int = 50000, ttl_seconds: float = 86400, db_path: str = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()  # message_id -> seen_at, oldest first
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes_since_prune = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS processed_messages ("
+                "message_id TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_processed_messages_seen_at ON processed_messages (seen_at)"
+            )
+            self._conn.commit()
+
+    @property
+    def blocking(self) -> bool:
+        """True when calls write to SQLite and may wait on file locks; async callers run them in a thread"""
+        return self._conn is not None
+
+    def is_duplicate(self, message_id: str) -> bool:
+        """Record message_id and return True if it was already seen within the TTL"""
+        if not message_id:
+            return False
+
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+
+            if message_id in self._entries:
+                self.hits += 1
+                return True
+
+            if self._conn is not None and not self._claim_in_db(message_id, now):
+                self._remember(message_id, now)
+                self.hits += 1
+                return True
+
+            self._remember(message_id, now)
+            self.misses += 1
+            return False
+
+    def forget(self, message_id: str):
+        """Drop message_id so a redelivery is processed (e.g. when it could not be queued)"""
+        if not message_id:
+            return
+        with self._lock:
+            self._entries.pop(message_id, None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM processed_messages WHERE message_id = ?", (message_id,))
+                self._conn.commit()
+
+    def _remember(self, message_id: str, seen_at: float):
+        self._entries[message_id] = seen_at
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _expire(self, now: float):
+        # IDs are stored in arrival order, so expired ones are always at the front
+        cutoff = now - self.ttl_seconds
+        while self._entries:
+            message_id, seen_at = next(iter(self._entries.items()))
+            if seen_at >= cutoff:
+                break
+            self._entries.popitem(last=False)
+
+    def _claim_in_db(self, message_id: str, now: float) -> bool:
+        """Insert (or revive an expired) row; returns False if a live row already exists"""
+        cursor = self._conn.execute(
+            "INSERT INTO processed_messages (message_id, seen_at) VALUES (?, ?) "
+            "ON CONFLICT(message_id) DO UPDATE SET seen_at = excluded.seen_at "
+            "WHERE processed_messages.seen_at < ?",
+            (message_id, now, now - self.ttl_seconds)
+        )
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= 1000:
+            self._prune_db(now)
+        self._conn.commit()
+        return cursor.rowcount > 0
+
+    def _prune_db(self, now: float):
+        self._writes_since_prune = 0
+        self._conn.execute("DELETE FROM processed_messages WHERE seen_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM processed_messages WHERE message_id IN ("
+            "SELECT message_id FROM processed_messages ORDER BY seen_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,)
+        )
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite" if self.db_path else "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
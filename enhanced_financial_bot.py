@@ -5,27 +5,65 @@ Enhanced Financial Bot with Google Search Grounding and Better Responses
 
 from dotenv import load_dotenv
 import os
+import asyncio
 import pandas as pd
 import time
+from itertools import islice
 from datetime import datetime, date, timedelta
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from config import GEMINI_MODEL
+from config import (
+    GEMINI_MODEL, FAST_INTENT_ENABLED, FAST_INTENT_MIN_CONFIDENCE, TRANSACTION_SINGLE_CALL,
+    SEARCH_CACHE_MAX_SIZE, SEARCH_CACHE_RATES_TTL, SEARCH_CACHE_DEFINITION_TTL, HISTORY_MAX_ROWS
+)
 import json
 import re
 from termcolor import cprint
 from csv_operation import read_queries, write_response
 
 # Import database functions
-from add_data_in_database import get_user_financial_data, add_user, add_interaction, TransactionType
+from add_data_in_database import (
+    get_user_financial_summary, iter_user_transactions, search_user_transactions, summarize_transaction_rows,
+    get_largest_transactions, add_user, add_interactions_batch, TransactionType
+)
+from async_database import (
+    message_session, aadd_user, aadd_interactions_batch, aget_user_financial_summary, aiter_user_transactions,
+    asearch_user_transactions, aget_largest_transactions
+)
+from history_planner import plan_history_query
+from prompt_builder import PromptBuilder
+from conversation_summary import update_conversation_summary, format_conversation_summary
+from state_backend import InMemoryStateBackend
+from fast_intent_classifier import FastIntentClassifier
+from response_cache import TTLCache
 
 # Import Google AI for grounding
 import google.generativeai as genai
 from google.generativeai import types
 
+NO_FOLLOW_UP_CONTEXT_RESPONSE = "Hey buddy! 🤔 I don't see any previous conversation to refer to. Could you be more specific about what you're asking?"
+FOLLOW_UP_ERROR_RESPONSE = "Hey buddy! 😅 I can see you're referring to our previous chat, but I'm having trouble processing that right now. Could you be more specific about what you need?"
+TRANSACTION_SAVE_ERROR_RESPONSE = "Hey buddy, I understood what you wanted to record but had trouble saving it. Can you try again? 🤔"
+
+# Search cache: filler words dropped from the key, and words that mark a live-rate question
+SEARCH_STOPWORDS = {"what", "whats", "is", "are", "the", "a", "an", "of", "please", "tell", "me", "about", "can", "you", "s"}
+RATE_QUERY_WORDS = {
+    "rate", "rates", "price", "prices", "today", "todays", "current", "live", "now", "latest",
+    "stock", "share", "nifty", "sensex", "bitcoin", "btc", "crypto", "gold", "silver", "usd", "inr", "exchange", "market"
+}
+
+CATEGORY_EMOJIS = {
+    "Food": "🍽️", "Transport": "🚕", "Shopping": "🛍️", "Entertainment": "🎬", "Utilities": "💡",
+    "Healthcare": "💊", "Health": "💪", "Housing": "🏠", "Education": "📚", "Income": "💰",
+}
+
+def format_rupees(amount) -> str:
+    """Amount with thousands separators and at most two decimals ("1,234,567", "12,345.67")"""
+    return f"{amount:,.2f}".rstrip("0").rstrip(".")
+
 class EnhancedFinancialBot:
-    def __init__(self):
+    def __init__(self, state_backend=None):
         load_dotenv()
         self.api_key = os.getenv("GEMINI_API_KEY")
         os.environ["GOOGLE_API_KEY"] = self.api_key
@@ -41,32 +79,34 @@ class EnhancedFinancialBot:
         # Google AI client for grounding
         genai.configure(api_key=self.api_key)
         self.google_client = genai
+        self.search_model = genai.GenerativeModel("gemini-2.0-flash")
+        self.search_cache = TTLCache(max_size=SEARCH_CACHE_MAX_SIZE, default_ttl=SEARCH_CACHE_DEFINITION_TTL)
+
+        # Local pre-classifier that answers obvious greetings/transactions without an LLM call
+        self.fast_classifier = FastIntentClassifier(min_confidence=FAST_INTENT_MIN_CONFIDENCE) if FAST_INTENT_ENABLED else None
+
+        # Let the classifier write the transaction acknowledgement instead of a second LLM call
+        self.transaction_single_call = TRANSACTION_SINGLE_CALL
+        self.history_max_rows = HISTORY_MAX_ROWS
         
         self.today = date.today()
         print(f"Bot initialized for date: {self.today}")
 
-        # Initialize chat history storage for each user
-        self.chat_histories = {}
+        # Chat history storage for each user (in-process unless a shared backend is given)
         self.max_history_length = 20
+        self.state = state_backend or InMemoryStateBackend(max_history_length=self.max_history_length)
 
     def get_chat_history(self, user_id: int):
         """Get chat history for a specific user"""
-        return self.chat_histories.get(user_id, [])
+        return self.state.get_chat_history(user_id)
 
     def add_to_chat_history(self, user_id: int, message):
         """Add a message to user's chat history"""
-        if user_id not in self.chat_histories:
-            self.chat_histories[user_id] = []
-        
-        self.chat_histories[user_id].append(message)
-        
-        if len(self.chat_histories[user_id]) > self.max_history_length:
-            self.chat_histories[user_id] = self.chat_histories[user_id][-self.max_history_length:]
+        self.state.append_chat_message(user_id, message)
 
     def clear_chat_history(self, user_id: int):
         """Clear chat history for a specific user"""
-        if user_id in self.chat_histories:
-            del self.chat_histories[user_id]
+        if self.state.clear_chat_history(user_id):
             return "Chat history cleared, buddy! 🧹 Fresh start!"
         return "No chat history to clear, buddy! 📝"
 
@@ -82,6 +122,24 @@ class EnhancedFinancialBot:
         
         return f"Chat Summary:\n📝 Total messages: {len(chat_history)}\n👤 Your messages: {len(user_messages)}\n🤖 My responses: {len(ai_messages)}\n💬 Last message: {chat_history[-1].content[:100]}..."
 
+    async def _astate(self, method, *args):
+        """Run a state backend call off the event loop when the backend blocks (SQLite waits on file locks)"""
+        if self.state.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def get_conversation_summary(self, user_id: int) -> dict:
+        """Rolling summary of the conversation so far (last intent, date range, category, key figures)"""
+        return self.state.get_conversation_summary(user_id)
+
+    def update_conversation_summary(self, user_id: int, user_message: str, classification: dict, response: str,
+                                    facts: dict = None):
+        """Fold the finished turn into the user's conversation summary"""
+        summary = update_conversation_summary(
+            self.get_conversation_summary(user_id), user_message, classification, response, facts
+        )
+        self.state.set_conversation_summary(user_id, summary)
+
     def extract_json(self, text):
         try:
             cleaned_text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip(), flags=re.IGNORECASE).strip()
@@ -97,32 +155,34 @@ class EnhancedFinancialBot:
             print(f"Raw output:\n{text}")
         return None
 
-    def classify_user_intent(self, user_message: str, user_id: int):
-        """Classify user intent and extract relevant information"""
+    def _build_classification_messages(self, user_message: str, conversation_summary: dict):
+        """Build the classifier prompt for a user message"""
         
-        # Get chat history for context
-        chat_history = self.get_chat_history(user_id)
+        # Conversation summary for context (a few fixed lines, not the raw messages)
+        conversation_context = format_conversation_summary(conversation_summary)
         
-        # Create context from recent chat history
-        history_context = ""
-        if chat_history:
-            history_context = "\n\nRECENT CONVERSATION HISTORY (for context):\n"
-            for msg in chat_history[-10:]:  # Last 10 messages for context
-                if isinstance(msg, HumanMessage):
-                    history_context += f"User: {msg.content}\n"
-                elif isinstance(msg, AIMessage):
-                    # Truncate long AI responses for context
-                    content = msg.content[:200] + "..." if len(msg.content) > 200 else msg.content
-                    history_context += f"Assistant: {content}\n"
+        # In single-call mode the classifier also writes the reply for recorded transactions
+        ack_field = ""
+        ack_rules = ""
+        if self.transaction_single_call:
+            ack_field = ',\n    "acknowledgement": "Brief enthusiastic reply to the user"'
+            ack_rules = """
+For transaction: also write `acknowledgement`, a natural 1-2 sentence reply that addresses the user as "buddy",
+acknowledges what they specifically mentioned with the ₹ amount, uses relevant emojis, celebrates income and
+acknowledges expenses positively. Example: "Nice shopping, buddy! 👕 That ₹300 shirt purchase is tracked - hope you look awesome in it! ✨"
+"""
         
-        system_prompt = f"""
+        prompt = PromptBuilder("classifier")
+        prompt.add(f"""
 You are an intelligent classifier for a financial tracker bot.
 
 Today's date is {self.today}.
 
-IMPORTANT: Use the conversation history below to understand context and follow-up questions.
-{history_context}
-
+IMPORTANT: Use the conversation summary below to understand context and follow-up questions.
+""")
+        if conversation_context:
+            prompt.add(f"\n\nCONVERSATION SO FAR (for context):\n{conversation_context}")
+        prompt.add(f"""
 Classify the user message into one of the following intents:
 1. `greeting`: Greetings, thanks, or social niceties.
 2. `transaction`: Reports one or more completed financial activities (I spent, I earned, I paid, etc.).
@@ -142,9 +202,10 @@ For transaction_history: Extract date ranges from the message:
 - If user mentions specific dates/ranges, extract them
 - If no date mentioned, set both start_date and end_date as null (fetch ALL transactions)
 - "this week" = last 7 days, "this month" = current month, etc.
+- If the user asks about a specific merchant or item ("Starbucks", "petrol", "Netflix"), put that keyword in search_text, otherwise null
 
-For follow_up: Identify what the user is referring to based on conversation history.
-
+For follow_up: Identify what the user is referring to based on the conversation summary.
+{ack_rules}
 Return ONLY a JSON object:
 
 For greeting/out_of_context:
@@ -164,7 +225,7 @@ For transaction:
             "subcategory_name": "specific item/service",
             "transaction_date": "{self.today.strftime('%Y-%m-%d')}"
         }}
-    ]
+    ]{ack_field}
 }}
 
 For transaction_history:
@@ -173,7 +234,8 @@ For transaction_history:
     "query_type": "expenses" | "income" | "report" | "category_wise" | "general",
     "start_date": "YYYY-MM-DD" | null,
     "end_date": "YYYY-MM-DD" | null,
-    "category_filter": "Food" | "Transport" | etc | null
+    "category_filter": "Food" | "Transport" | etc | null,
+    "search_text": "merchant or item keyword" | null
 }}
 
 For follow_up:
@@ -190,13 +252,27 @@ For financial_info:
 }}
 
 Return only JSON, no explanation.
-"""
+""")
 
-        messages = [
-            SystemMessage(content=system_prompt),
+        return [
+            SystemMessage(content=prompt.build()),
             HumanMessage(content=user_message)
         ]
 
+    def _fast_classify(self, user_message: str):
+        """Try the rule-based classifier first; returns None when the LLM is needed"""
+        if self.fast_classifier is None:
+            return None
+        return self.fast_classifier.classify(user_message, self.today)
+
+    def classify_user_intent(self, user_message: str, user_id: int):
+        """Classify user intent and extract relevant information"""
+        classification = self._fast_classify(user_message)
+        if classification:
+            return classification
+
+        messages = self._build_classification_messages(user_message, self.get_conversation_summary(user_id))
+
         try:
             response = self.chat_model.invoke(messages)
             return self.extract_json(response.content)
@@ -204,49 +280,110 @@ Return only JSON, no explanation.
             print(f"Classification error: {e}")
             return {"intent": "out_of_context", "response": "Sorry, I had trouble understanding that."}
 
+    async def aclassify_user_intent(self, user_message: str, user_id: int):
+        """Async version of classify_user_intent"""
+        classification = self._fast_classify(user_message)
+        if classification:
+            return classification
+
+        conversation_summary = await self._astate(self.get_conversation_summary, user_id)
+        messages = self._build_classification_messages(user_message, conversation_summary)
+
+        try:
+            response = await self.chat_model.ainvoke(messages)
+            return self.extract_json(response.content)
+        except Exception as e:
+            print(f"Classification error: {e}")
+            return {"intent": "out_of_context", "response": "Sorry, I had trouble understanding that."}
+
+    def _search_prompt(self, query: str) -> str:
+        prompt = PromptBuilder("financial_info")
+        prompt.add(f"Answer this financial question with current information: {query}. Provide a comprehensive but concise answer.")
+        return prompt.build()
+
+    def _search_result_text(self, response):
+        if response and response.text:
+            return response.text
+        return None
+
+    def _search_cache_key(self, query: str):
+        """Normalized cache key and TTL for a search query (live rates expire much sooner than definitions)"""
+        words = re.findall(r"[a-z0-9₹$%.]+", query.lower())
+        words = [word.strip(".") for word in words if word.strip(".") and word not in SEARCH_STOPWORDS]
+        ttl = SEARCH_CACHE_RATES_TTL if RATE_QUERY_WORDS.intersection(words) else SEARCH_CACHE_DEFINITION_TTL
+        return " ".join(words) or query.strip().lower(), ttl
+
     def search_financial_info(self, query: str) -> str:
         """Use Google Search grounding for financial information"""
+        key, ttl = self._search_cache_key(query)
         try:
-            model = genai.GenerativeModel("gemini-2.0-flash")
-            response = model.generate_content(
-                f"Answer this financial question with current information: {query}. Provide a comprehensive but concise answer."
+            answer = self.search_cache.get_or_load(
+                key,
+                lambda: self._search_result_text(self.search_model.generate_content(self._search_prompt(query))),
+                ttl
             )
-            
-            if response and response.text:
-                return response.text
-            else:
-                return "I couldn't find information about that right now. Please try again later."
-                
         except Exception as e:
             print(f"Search error: {e}")
             return "I'm having trouble accessing current information right now. Please try again later."
+        return answer or "I couldn't find information about that right now. Please try again later."
 
-    def handle_follow_up(self, user_id: int, follow_up_info: dict, original_query: str) -> str:
-        """Handle follow-up questions based on conversation history"""
+    async def asearch_financial_info(self, query: str) -> str:
+        """Async version of search_financial_info; concurrent identical queries share one Gemini call"""
+        key, ttl = self._search_cache_key(query)
+
+        async def load():
+            response = await self.search_model.generate_content_async(self._search_prompt(query))
+            return self._search_result_text(response)
+
+        try:
+            answer = await self.search_cache.aget_or_load(key, load, ttl)
+        except Exception as e:
+            print(f"Search error: {e}")
+            return "I'm having trouble accessing current information right now. Please try again later."
+        return answer or "I couldn't find information about that right now. Please try again later."
+
+    def _follow_up_snapshot(self, user_id: int, follow_up_info: dict):
+        """Aggregate-only snapshot of the last 30 days for follow-ups about previous data"""
+        if follow_up_info.get("reference_type") != "previous_data":
+            return None
+        return get_user_financial_summary(user_id, self.today - timedelta(days=30), self.today)
+
+    async def _afollow_up_snapshot(self, user_id: int, follow_up_info: dict):
+        """Async version of _follow_up_snapshot"""
+        if follow_up_info.get("reference_type") != "previous_data":
+            return None
+        return await aget_user_financial_summary(user_id, self.today - timedelta(days=30), self.today)
+
+    def _build_follow_up_prompt(self, conversation_summary: dict, original_query: str, snapshot: dict = None):
+        """Build the follow-up prompt, or return None if there is no conversation to refer to"""
         
-        chat_history = self.get_chat_history(user_id)
+        recent_context = format_conversation_summary(conversation_summary)
         
-        if not chat_history:
-            return "Hey buddy! 🤔 I don't see any previous conversation to refer to. Could you be more specific about what you're asking?"
+        if not recent_context:
+            return None
         
-        # Get recent conversation for context
-        recent_context = ""
-        for msg in chat_history[-6:]:  # Last 6 messages
-            if isinstance(msg, HumanMessage):
-                recent_context += f"User: {msg.content}\n"
-            elif isinstance(msg, AIMessage):
-                recent_context += f"Assistant: {msg.content}\n"
+        snapshot_context = ""
+        if snapshot and snapshot['transaction_count']:
+            breakdown = ", ".join(f"{category}: ₹{format_rupees(amount)}" for category, amount in snapshot['category_breakdown'].items())
+            snapshot_context = f"""
+USER'S FINANCIAL SNAPSHOT (last 30 days):
+- Transactions: {snapshot['transaction_count']}
+- Total expenses: ₹{snapshot['total_expenses']}
+- Total income: ₹{snapshot['total_income']}
+- Expenses by category: {breakdown or "none"}
+"""
         
         # Generate contextual response
-        prompt = f"""
+        prompt = PromptBuilder("follow_up")
+        prompt.add(f"""
 You are a friendly financial assistant. The user is asking a follow-up question.
 
 USER'S FOLLOW-UP QUESTION: "{original_query}"
 
-RECENT CONVERSATION:
+CONVERSATION SO FAR:
 {recent_context}
-
-Based on the conversation history, provide a helpful response that:
+{snapshot_context}
+Based on the conversation so far, provide a helpful response that:
 1. Addresses the user as "buddy"
 2. References the previous conversation appropriately
 3. Provides the information they're looking for
@@ -256,17 +393,38 @@ Based on the conversation history, provide a helpful response that:
 If they're asking for more details about previous data, provide it.
 If they're asking for clarification, explain clearly.
 If they're asking for related information, provide it.
-"""
+""")
+        return prompt.build()
+
+    def handle_follow_up(self, user_id: int, follow_up_info: dict, original_query: str) -> str:
+        """Handle follow-up questions based on conversation history"""
+        snapshot = self._follow_up_snapshot(user_id, follow_up_info)
+        prompt = self._build_follow_up_prompt(self.get_conversation_summary(user_id), original_query, snapshot)
+        if prompt is None:
+            return NO_FOLLOW_UP_CONTEXT_RESPONSE
 
         try:
             response = self.chat_model.invoke([HumanMessage(content=prompt)])
             return response.content
         except Exception as e:
-            return "Hey buddy! 😅 I can see you're referring to our previous chat, but I'm having trouble processing that right now. Could you be more specific about what you need?"
+            return FOLLOW_UP_ERROR_RESPONSE
 
-    def generate_transaction_history_response(self, user_id: int, query_info: dict, original_query: str) -> str:
-        """Generate quirky buddy-style response for transaction history"""
-        
+    async def ahandle_follow_up(self, user_id: int, follow_up_info: dict, original_query: str) -> str:
+        """Async version of handle_follow_up"""
+        snapshot = await self._afollow_up_snapshot(user_id, follow_up_info)
+        conversation_summary = await self._astate(self.get_conversation_summary, user_id)
+        prompt = self._build_follow_up_prompt(conversation_summary, original_query, snapshot)
+        if prompt is None:
+            return NO_FOLLOW_UP_CONTEXT_RESPONSE
+
+        try:
+            response = await self.chat_model.ainvoke([HumanMessage(content=prompt)])
+            return response.content
+        except Exception as e:
+            return FOLLOW_UP_ERROR_RESPONSE
+
+    def _history_date_range(self, query_info: dict):
+        """Resolve the date range for a transaction history query"""
         start_date = query_info.get("start_date")
         end_date = query_info.get("end_date")
         
@@ -274,121 +432,229 @@ If they're asking for related information, provide it.
         if not start_date or not end_date:
             end_date = self.today.strftime("%Y-%m-%d")
             start_date = "2020-01-01"  # Very old date to get all transactions
+        return start_date, end_date
+
+    def _load_history(self, user_id: int, start_date, end_date, plan: dict):
+        """
+        Run the planned queries: totals from SQL (or from the matches for a keyword search)
+        plus at most plan["row_limit"] rows, so the prompt stays small however long the history is.
+        Returns (summary, table_rows).
+        """
+        if plan["rows"] == "search":
+            rows = search_user_transactions(
+                user_id, plan["search_text"], start_date, end_date,
+                transaction_type=plan["transaction_type"], category_name=plan["category"]
+            ) or []
+            return summarize_transaction_rows(rows, start_date, end_date), [
+                self._history_table_row(transaction) for transaction in rows[:plan["row_limit"]]
+            ]
+
+        summary = get_user_financial_summary(user_id, start_date, end_date, plan["transaction_type"], plan["category"])
+        if not summary or not summary['transaction_count'] or not plan["rows"]:
+            return summary, []
+
+        if plan["rows"] == "largest":
+            rows = get_largest_transactions(
+                user_id, start_date, end_date, plan["rows_transaction_type"], plan["category"], plan["row_limit"]
+            ) or []
+        else:
+            rows = islice(iter_user_transactions(
+                user_id, start_date, end_date, page_size=plan["row_limit"],
+                transaction_type=plan["rows_transaction_type"], category_name=plan["category"]
+            ), plan["row_limit"])
+        return summary, [self._history_table_row(transaction) for transaction in rows]
+
+    async def _aload_history(self, user_id: int, start_date, end_date, plan: dict):
+        """Async version of _load_history"""
+        if plan["rows"] == "search":
+            rows = await asearch_user_transactions(
+                user_id, plan["search_text"], start_date, end_date,
+                transaction_type=plan["transaction_type"], category_name=plan["category"]
+            ) or []
+            return summarize_transaction_rows(rows, start_date, end_date), [
+                self._history_table_row(transaction) for transaction in rows[:plan["row_limit"]]
+            ]
+
+        summary = await aget_user_financial_summary(user_id, start_date, end_date, plan["transaction_type"], plan["category"])
+        if not summary or not summary['transaction_count'] or not plan["rows"]:
+            return summary, []
+
+        if plan["rows"] == "largest":
+            rows = await aget_largest_transactions(
+                user_id, start_date, end_date, plan["rows_transaction_type"], plan["category"], plan["row_limit"]
+            ) or []
+            return summary, [self._history_table_row(transaction) for transaction in rows]
+
+        table_rows = []
+        async for transaction in aiter_user_transactions(
+            user_id, start_date, end_date, page_size=plan["row_limit"],
+            transaction_type=plan["rows_transaction_type"], category_name=plan["category"]
+        ):
+            table_rows.append(self._history_table_row(transaction))
+            if len(table_rows) >= plan["row_limit"]:
+                break
+        return summary, table_rows
+
+    def _history_table_row(self, transaction) -> str:
+        date_str = transaction.transaction_date.strftime('%d/%m/%Y') if transaction.transaction_date else ""
+        amount_str = f"₹{transaction.amount}"
+        if transaction.transaction_type == 'Credit':
+            amount_str = f"+{amount_str}"
+        else:
+            amount_str = f"-{amount_str}"
+
+        return f"{date_str} | {transaction.category_name} | {transaction.subcategory_name} | {amount_str}"
+
+    def _history_facts(self, start_date, end_date, plan: dict, summary: dict) -> dict:
+        """Key figures of a history answer, kept in the conversation summary"""
+        facts = {"start_date": str(start_date), "end_date": str(end_date), "scope": plan["scope"]}
+        if summary:
+            breakdown = summary['category_breakdown']
+            facts.update(
+                transaction_count=summary['transaction_count'],
+                total_expenses=summary['total_expenses'],
+                total_income=summary['total_income'],
+                top_category=max(breakdown, key=breakdown.get) if breakdown else None,
+            )
+        return facts
+
+    def _build_history_prompt(self, summary: dict, table_rows: list, original_query: str, plan: dict):
+        """
+        Build the history prompt from the planned query results.
+        Returns (prompt, fallback_response); prompt is None when there is nothing to report.
+        """
+        if plan["search_text"] and summary and not summary['transaction_count']:
+            return None, f"Hey buddy! 🔍 I couldn't find any transactions mentioning \"{plan['search_text']}\" in that period. Try another keyword or a wider date range! 😊"
+        if not summary or not summary['transaction_count']:
+            return None, "Hey buddy! 👋 Looks like your wallet has been pretty quiet - no transactions found in that period. Time to get out there and spend some money! 💸 (Just kidding, saving is good too! 😄)"
         
-        # Get financial data
-        data = get_user_financial_data(user_id, start_date, end_date)
-        
-        if not data or not data['transactions']:
-            return "Hey buddy! 👋 Looks like your wallet has been pretty quiet - no transactions found in that period. Time to get out there and spend some money! 💸 (Just kidding, saving is good too! 😄)"
+        # Expense totals per category (GROUP BY), largest first
+        breakdown_lines = []
+        breakdown_section = ""
+        if plan["show_breakdown"] and summary['category_breakdown']:
+            total_expenses = summary['total_expenses'] or 1
+            breakdown_lines = [
+                f"{category} | ₹{format_rupees(amount)} | {amount / total_expenses:.0%}"
+                for category, amount in sorted(summary['category_breakdown'].items(), key=lambda item: -item[1])
+            ]
+            breakdown_section = "\nEXPENSES BY CATEGORY (Category | Amount | Share):\n" + "\n".join(breakdown_lines) + "\n"
         
         # Create clean table format
-        if data['transactions']:
-            # Format transactions into a clean table
-            table_rows = []
-            for transaction in data['transactions']:
-                date_str = transaction['transaction_date'].strftime('%d/%m/%Y') if hasattr(transaction['transaction_date'], 'strftime') else str(transaction['transaction_date'])
-                amount_str = f"₹{transaction['amount']}"
-                if transaction['transaction_type'] == 'Credit':
-                    amount_str = f"+{amount_str}"
-                else:
-                    amount_str = f"-{amount_str}"
-                
-                table_rows.append(f"{date_str} | {transaction['category_name']} | {transaction['subcategory_name']} | {amount_str}")
-            
-            transactions_table = "\n".join(table_rows)
-        else:
-            transactions_table = "No transactions found"
+        table_header = f"\n{plan['rows_title']} (Date | Category | Description | Amount):\n"
+        table_note = ""
+        if plan["rows"] == "recent" and summary['transaction_count'] > len(table_rows):
+            table_note = f"(showing the latest {len(table_rows)} of {summary['transaction_count']} transactions)\n"
+        table_section = table_header + "\n".join(table_rows) + "\n" + table_note if table_rows else ""
         
-        # Generate response using AI with formatted data
-        prompt = f"""You are a friendly financial assistant. Address the user as "buddy" and be conversational.
+        # Generate response using AI with formatted data; rows past the token budget are left out
+        prompt = PromptBuilder("transaction_history")
+        prompt.add(f"""You are a friendly financial assistant. Address the user as "buddy" and be conversational.
 
 USER QUERY: "{original_query}"
 
-TRANSACTION SUMMARY:
-- Total transactions: {len(data['transactions'])}
-- Total expenses: ₹{data['total_expenses']}
-- Total income: ₹{data['total_income']}
-- Net amount: ₹{data['total_income'] - data['total_expenses']}
-
-TRANSACTION TABLE (Date | Category | Description | Amount):
-{transactions_table}
-
+TRANSACTION SUMMARY ({plan['scope']}):
+- Total transactions: {summary['transaction_count']}
+- Total expenses: ₹{summary['total_expenses']}
+- Total income: ₹{summary['total_income']}
+- Net amount: ₹{summary['total_income'] - summary['total_expenses']}
+""")
+        if breakdown_lines:
+            prompt.add("\nEXPENSES BY CATEGORY (Category | Amount | Share):\n")
+            prompt.add_rows(breakdown_lines, omitted="... {count} smaller categories not shown")
+        if table_rows:
+            prompt.add(table_header)
+            prompt.add_rows(table_rows, omitted="... {count} more transactions not shown (they are included in the summary)")
+            prompt.add(table_note)
+        prompt.add("""
 Generate a response that:
 1. Starts with "Hey buddy!" 
-2. Summarizes their financial activity
-3. Shows the transaction table exactly as formatted above
+2. Answers their question using the figures above
+3. Shows the table(s) above exactly as formatted
 4. Adds encouraging insights
 5. Uses emojis and friendly tone
 6. Keep it organized and easy to read
 
-Format the table with proper spacing and alignment.
-"""
+Format tables with proper spacing and alignment.
+""")
+        fallback = f"Hey buddy! 😅 Here's your financial summary:\n\n📊 Transactions: {summary['transaction_count']}\n💸 Expenses: ₹{summary['total_expenses']}\n💰 Income: ₹{summary['total_income']}\n{breakdown_section}{table_section}"
+        return prompt.build(), fallback
+
+    def generate_transaction_history_response(self, user_id: int, query_info: dict, original_query: str,
+                                              facts: dict = None) -> str:
+        """
+        Generate quirky buddy-style response for transaction history.
+        If given, facts is filled with the answer's key figures for the conversation summary.
+        """
+        start_date, end_date = self._history_date_range(query_info)
+        plan = plan_history_query(query_info, self.history_max_rows)
+        
+        # Get financial data
+        summary, table_rows = self._load_history(user_id, start_date, end_date, plan)
+        if facts is not None:
+            facts.update(self._history_facts(start_date, end_date, plan, summary))
+        prompt, fallback = self._build_history_prompt(summary, table_rows, original_query, plan)
+        if prompt is None:
+            return fallback
 
         try:
             response = self.chat_model.invoke([HumanMessage(content=prompt)])
             return response.content
         except Exception as e:
-            return f"Hey buddy! 😅 Here's your financial summary:\n\n📊 Transactions: {len(data['transactions'])}\n💸 Expenses: ₹{data['total_expenses']}\n💰 Income: ₹{data['total_income']}\n\n📋 Recent Transactions:\nDate | Category | Description | Amount\n{transactions_table}"
+            return fallback
 
-    def process_message(self, user_message: str, whatsapp_number: str = None):
-        """Process user message and return appropriate response"""
+    async def agenerate_transaction_history_response(self, user_id: int, query_info: dict, original_query: str,
+                                                     facts: dict = None) -> str:
+        """Async version of generate_transaction_history_response"""
+        start_date, end_date = self._history_date_range(query_info)
+        plan = plan_history_query(query_info, self.history_max_rows)
         
-        # Get or create user
-        if whatsapp_number:
-            user_id = add_user(whatsapp_number)
-        else:
-            user_id = add_user("console_user")
-        
-        if user_id is None:
-            return "Sorry buddy, I'm having trouble setting up your account right now."
+        # Get financial data without blocking the event loop
+        summary, table_rows = await self._aload_history(user_id, start_date, end_date, plan)
+        if facts is not None:
+            facts.update(self._history_facts(start_date, end_date, plan, summary))
+        prompt, fallback = self._build_history_prompt(summary, table_rows, original_query, plan)
+        if prompt is None:
+            return fallback
 
-        # Add user message to chat history
-        self.add_to_chat_history(user_id, HumanMessage(content=user_message))
+        try:
+            response = await self.chat_model.ainvoke([HumanMessage(content=prompt)])
+            return response.content
+        except Exception as e:
+            return fallback
 
-        # Classify the intent
-        classification = self.classify_user_intent(user_message, user_id)
+    def _transaction_rows(self, user_message: str, transactions: list) -> list:
+        """Interaction rows for the extracted transactions; malformed ones are skipped"""
+        rows = []
         
-        if not classification:
-            return "Sorry buddy, I didn't quite get that. Can you try rephrasing?"
-
-        intent = classification.get("intent")
+        for transaction in transactions:
+            try:
+                rows.append({
+                    'message_text': user_message,
+                    'transaction_type': TransactionType.Debit if transaction["transaction_type"] == "Debit" else TransactionType.Credit,
+                    'amount': transaction["amount"],
+                    'category_name': transaction["category_name"],
+                    'subcategory_name': transaction["subcategory_name"],
+                    'transaction_date': datetime.strptime(transaction["transaction_date"], "%Y-%m-%d").date()
+                })
+            except Exception as e:
+                print(f"Error storing transaction: {e}")
+        return rows
+
+    def _store_transactions(self, user_id: int, user_message: str, transactions: list) -> int:
+        """Store extracted transactions in one batch and return how many were saved"""
+        return add_interactions_batch(user_id, self._transaction_rows(user_message, transactions), from_one_message=True)
+
+    async def _astore_transactions(self, user_id: int, user_message: str, transactions: list) -> int:
+        """Async version of _store_transactions"""
+        return await aadd_interactions_batch(user_id, self._transaction_rows(user_message, transactions), from_one_message=True)
+
+    def _build_transaction_ack_prompt(self, user_message: str, transactions: list) -> str:
+        """Build the prompt for the acknowledgement of recorded transactions"""
+        total_amount = sum(transaction['amount'] for transaction in transactions)
+        is_income = any(transaction['transaction_type'] == 'Credit' for transaction in transactions)
         
-        if intent == "greeting":
-            response = classification.get("response", "Hey buddy! How can I help you with your finances today? 💰")
-            
-        elif intent == "out_of_context":
-            response = "Hey buddy! I'm your financial assistant. I can help with tracking expenses, income, and answering financial questions. Try asking about your spending or financial topics! 📊"
-            
-        elif intent == "transaction":
-            # Store transactions
-            transactions = classification.get("transactions", [])
-            stored_count = 0
-            
-            for transaction in transactions:
-                try:
-                    add_interaction(
-                        user_id=user_id,
-                        message_text=user_message,
-                        transaction_type=TransactionType.Debit if transaction["transaction_type"] == "Debit" else TransactionType.Credit,
-                        amount=transaction["amount"],
-                        category_name=transaction["category_name"],
-                        subcategory_name=transaction["subcategory_name"],
-                        transaction_date=datetime.strptime(transaction["transaction_date"], "%Y-%m-%d").date()
-                    )
-                    stored_count += 1
-                except Exception as e:
-                    print(f"Error storing transaction: {e}")
-            
-            if stored_count > 0:
-                # Generate personalized response using LLM
-                total_amount = sum(transaction['amount'] for transaction in transactions)
-                transaction_types = [transaction['subcategory_name'] for transaction in transactions]
-                is_income = any(transaction['transaction_type'] == 'Credit' for transaction in transactions)
-                
-                # Determine transaction context from user message
-                user_context = user_message.lower()
-                
-                prompt = f"""You are a friendly financial assistant. The user just recorded a transaction.
+        prompt = PromptBuilder("transaction_ack")
+        prompt.add(f"""You are a friendly financial assistant. The user just recorded a transaction.
 
 USER'S ORIGINAL MESSAGE: "{user_message}"
 TRANSACTION AMOUNT: ₹{total_amount}
@@ -409,22 +675,106 @@ Examples:
 - For "I earned 2000 from freelancing": "Awesome work, buddy! 💪 That ₹2000 freelancing income is recorded - hustle paying off! 🚀"
 
 Generate a similar enthusiastic response based on their message.
-"""
+""")
+        return prompt.build()
+
+    def _transaction_ack_template(self, transactions: list) -> str:
+        """Local acknowledgement used when no model-written reply is available"""
+        total_amount = sum(transaction['amount'] for transaction in transactions)
+        if len(transactions) != 1:
+            return f"Got it, buddy! 📝 I've recorded {len(transactions)} transactions worth ₹{format_rupees(total_amount)} for you. Your financial tracking game is strong! 💪"
+
+        transaction = transactions[0]
+        emoji = CATEGORY_EMOJIS.get(transaction.get('category_name'), "💸")
+        item = (transaction.get("subcategory_name") or transaction.get("category_name") or "transaction").lower()
+        if transaction['transaction_type'] == 'Credit':
+            return f"Woohoo, nice one buddy! {emoji} Your ₹{format_rupees(total_amount)} {item} income is logged - time to celebrate! 🎉"
+        return f"Got it, buddy! {emoji} Your ₹{format_rupees(total_amount)} {item} expense is tracked - keeping that budget on point! 📊"
+
+    def _ready_transaction_ack(self, classification: dict, transactions: list):
+        """Acknowledgement that needs no extra LLM call, or None to ask the model for one"""
+        acknowledgement = classification.get("acknowledgement")
+        if isinstance(acknowledgement, str) and acknowledgement.strip():
+            return acknowledgement.strip()
+        if self.transaction_single_call or classification.get("source") == "fast_path":
+            return self._transaction_ack_template(transactions)
+        return None
 
-                try:
-                    llm_response = self.chat_model.invoke([HumanMessage(content=prompt)])
-                    response = llm_response.content
-                except Exception as e:
-                    print(f"Error generating LLM response: {e}")
-                    response = f"Got it, buddy! 📝 I've recorded {stored_count} transaction(s) for you. Your financial tracking game is strong! 💪"
-            else:
-                response = "Hey buddy, I understood what you wanted to record but had trouble saving it. Can you try again? 🤔"
+    def _handle_transaction(self, user_id: int, user_message: str, classification: dict) -> str:
+        transactions = classification.get("transactions", [])
+        stored_count = self._store_transactions(user_id, user_message, transactions)
+        if stored_count == 0:
+            return TRANSACTION_SAVE_ERROR_RESPONSE
+
+        acknowledgement = self._ready_transaction_ack(classification, transactions)
+        if acknowledgement:
+            return acknowledgement
+
+        # Generate personalized response using LLM
+        prompt = self._build_transaction_ack_prompt(user_message, transactions)
+        try:
+            llm_response = self.chat_model.invoke([HumanMessage(content=prompt)])
+            return llm_response.content
+        except Exception as e:
+            print(f"Error generating LLM response: {e}")
+            return f"Got it, buddy! 📝 I've recorded {stored_count} transaction(s) for you. Your financial tracking game is strong! 💪"
+
+    async def _ahandle_transaction(self, user_id: int, user_message: str, classification: dict) -> str:
+        transactions = classification.get("transactions", [])
+        stored_count = await self._astore_transactions(user_id, user_message, transactions)
+        if stored_count == 0:
+            return TRANSACTION_SAVE_ERROR_RESPONSE
+
+        acknowledgement = self._ready_transaction_ack(classification, transactions)
+        if acknowledgement:
+            return acknowledgement
+
+        # Generate personalized response using LLM
+        prompt = self._build_transaction_ack_prompt(user_message, transactions)
+        try:
+            llm_response = await self.chat_model.ainvoke([HumanMessage(content=prompt)])
+            return llm_response.content
+        except Exception as e:
+            print(f"Error generating LLM response: {e}")
+            return f"Got it, buddy! 📝 I've recorded {stored_count} transaction(s) for you. Your financial tracking game is strong! 💪"
+
+    def _static_response(self, intent: str, classification: dict) -> str:
+        """Responses for intents that need no further model or database calls"""
+        if intent == "greeting":
+            return classification.get("response", "Hey buddy! How can I help you with your finances today? 💰")
+        if intent == "out_of_context":
+            return "Hey buddy! I'm your financial assistant. I can help with tracking expenses, income, and answering financial questions. Try asking about your spending or financial topics! 📊"
+        return "Hey buddy! I'm not sure how to help with that. Try asking about your expenses, income, or financial questions! 💡"
+
+    def process_message(self, user_message: str, whatsapp_number: str = None):
+        """Process user message and return appropriate response"""
+        
+        # Get or create user
+        user_id = add_user(whatsapp_number or "console_user")
+        
+        if user_id is None:
+            return "Sorry buddy, I'm having trouble setting up your account right now."
+
+        # Add user message to chat history
+        self.add_to_chat_history(user_id, HumanMessage(content=user_message))
+
+        # Classify the intent
+        classification = self.classify_user_intent(user_message, user_id)
+        
+        if not classification:
+            return "Sorry buddy, I didn't quite get that. Can you try rephrasing?"
+
+        intent = classification.get("intent")
+        facts = {}
+        
+        if intent == "transaction":
+            response = self._handle_transaction(user_id, user_message, classification)
                 
         elif intent == "follow_up":
             response = self.handle_follow_up(user_id, classification, user_message)
             
         elif intent == "transaction_history":
-            response = self.generate_transaction_history_response(user_id, classification, user_message)
+            response = self.generate_transaction_history_response(user_id, classification, user_message, facts)
             
         elif intent == "financial_info":
             search_query = classification.get("search_query", user_message)
@@ -432,10 +782,62 @@ Generate a similar enthusiastic response based on their message.
             response = f"Hey buddy! 🔍 Here's what I found:\n\n{search_result}"
             
         else:
-            response = "Hey buddy! I'm not sure how to help with that. Try asking about your expenses, income, or financial questions! 💡"
+            response = self._static_response(intent, classification)
 
-        # Add AI response to chat history
+        # Add AI response to chat history and fold the turn into the conversation summary
         self.add_to_chat_history(user_id, AIMessage(content=response))
+        self.update_conversation_summary(user_id, user_message, classification, response, facts)
+        
+        return response
+
+    async def aprocess_message(self, user_message: str, whatsapp_number: str = None):
+        """
+        Async version of process_message.
+        Gemini calls and database work both go through async APIs (one database
+        session per message), so the event loop is never blocked while a user waits.
+        """
+        async with message_session():
+            return await self._aprocess_message(user_message, whatsapp_number)
+
+    async def _aprocess_message(self, user_message: str, whatsapp_number: str = None):
+        # Get or create user
+        user_id = await aadd_user(whatsapp_number or "console_user")
+        
+        if user_id is None:
+            return "Sorry buddy, I'm having trouble setting up your account right now."
+
+        # Add user message to chat history
+        await self._astate(self.add_to_chat_history, user_id, HumanMessage(content=user_message))
+
+        # Classify the intent
+        classification = await self.aclassify_user_intent(user_message, user_id)
+        
+        if not classification:
+            return "Sorry buddy, I didn't quite get that. Can you try rephrasing?"
+
+        intent = classification.get("intent")
+        facts = {}
+        
+        if intent == "transaction":
+            response = await self._ahandle_transaction(user_id, user_message, classification)
+                
+        elif intent == "follow_up":
+            response = await self.ahandle_follow_up(user_id, classification, user_message)
+            
+        elif intent == "transaction_history":
+            response = await self.agenerate_transaction_history_response(user_id, classification, user_message, facts)
+            
+        elif intent == "financial_info":
+            search_query = classification.get("search_query", user_message)
+            search_result = await self.asearch_financial_info(search_query)
+            response = f"Hey buddy! 🔍 Here's what I found:\n\n{search_result}"
+            
+        else:
+            response = self._static_response(intent, classification)
+
+        # Add AI response to chat history and fold the turn into the conversation summary
+        await self._astate(self.add_to_chat_history, user_id, AIMessage(content=response))
+        await self._astate(self.update_conversation_summary, user_id, user_message, classification, response, facts)
         
         return response
 
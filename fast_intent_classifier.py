@@ -0,0 +1,195 @@
+"""
+Rule-based fast-path intent classifier that runs ahead of the Gemini classifier
+
+Recognises greetings/thanks and simple single-amount transaction statements
+("spent 500 on groceries", "paid rs 80 for auto") locally and deterministically.
+Anything it is not confident about is left to the LLM.
+"""
+
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+GREETING_RESPONSE = "Hey buddy! 👋 How can I help you with your finances today? 💰"
+THANKS_RESPONSE = "Anytime, buddy! 😊 Let me know whenever you want to track something or check your spending. 💰"
+
+GREETING_PATTERN = re.compile(
+    r"^(hi+|hello+|hey+|hola|namaste|yo|good (morning|afternoon|evening))"
+    r"( (there|buddy|bot|finbot))?$"
+)
+THANKS_PATTERN = re.compile(
+    r"^(ok(ay)? )?(thanks+|thank you|thank u|thx|ty|thanks a lot|thank you so much|great thanks|cool thanks)"
+    r"( (buddy|bot|finbot))?$"
+)
+
+# An amount with an optional Indian-English scale suffix ("5k", "2 lakh", "1.5L", "3 cr")
+AMOUNT_PATTERN = re.compile(r"(\d[\d,]*(?:\.\d+)?)(?:\s*(k|thousand|l|lakhs?|lacs?|cr|crores?)\b)?")
+AMOUNT_MULTIPLIERS = {
+    "k": 1000, "thousand": 1000,
+    "l": 100000, "lakh": 100000, "lakhs": 100000, "lac": 100000, "lacs": 100000,
+    "cr": 10000000, "crore": 10000000, "crores": 10000000,
+}
+UNIT_AFTER_AMOUNT = re.compile(r"(?!rs\b)[a-z]")
+CURRENCY_PATTERN = re.compile(r"₹|\brs\.?(?=\s|\d|$)|\brupees?\b|\binr\b|/-")
+
+DEBIT_VERBS = {"spent", "spend", "paid", "pay", "bought", "purchased", "gave"}
+CREDIT_VERBS = {"earned", "received", "credited"}
+
+# Words that make a message too ambiguous for the fast path
+QUESTION_WORDS = {"what", "how", "show", "when", "where", "which", "why", "did", "do", "can", "list", "tell", "much"}
+NEGATION_WORDS = {"not", "didnt", "didn", "never", "no", "dont", "don"}
+INTENTION_WORDS = {"will", "plan", "planning", "going", "should", "budget", "want", "wanna", "may", "might", "if"}
+# Only a bare "today" or "yesterday" is resolved locally; any other time phrase goes to the LLM
+DATE_WORDS = {
+    "last", "ago", "before", "earlier", "previous", "past", "next", "since", "tomorrow", "yday", "ystd",
+    "date", "day", "days", "week", "weeks", "weekend", "weekends", "month", "months", "year", "years",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "mon", "tue", "tues", "wed", "thu", "thur", "thurs", "fri", "sat", "sun",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+    "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+    "diwali", "holi", "eid", "christmas", "xmas", "navratri", "dussehra", "durga", "puja", "pongal", "onam",
+    "rakhi", "lohri", "sankranti", "ganesh", "chaturthi", "festival",
+}
+
+# keyword -> (category_name, subcategory_name, transaction_type or None)
+CATEGORY_KEYWORDS = {
+    # Food
+    "groceries": ("Food", "Groceries", None), "grocery": ("Food", "Groceries", None),
+    "vegetables": ("Food", "Vegetables", None), "fruits": ("Food", "Fruits", None),
+    "milk": ("Food", "Milk", None), "lunch": ("Food", "Lunch", None),
+    "dinner": ("Food", "Dinner", None), "breakfast": ("Food", "Breakfast", None),
+    "snacks": ("Food", "Snacks", None), "chai": ("Food", "Chai", None), "tea": ("Food", "Tea", None),
+    "coffee": ("Food", "Coffee", None), "food": ("Food", "Food", None),
+    "restaurant": ("Food", "Restaurant", None), "swiggy": ("Food", "Delivery", None),
+    "zomato": ("Food", "Delivery", None), "pizza": ("Food", "Pizza", None),
+    # Transport
+    "auto": ("Transport", "Auto", None), "rickshaw": ("Transport", "Auto", None),
+    "uber": ("Transport", "Taxi", None), "ola": ("Transport", "Taxi", None),
+    "taxi": ("Transport", "Taxi", None), "cab": ("Transport", "Taxi", None),
+    "bus": ("Transport", "Bus", None), "metro": ("Transport", "Metro", None),
+    "train": ("Transport", "Train", None), "petrol": ("Transport", "Fuel", None),
+    "diesel": ("Transport", "Fuel", None), "fuel": ("Transport", "Fuel", None),
+    "parking": ("Transport", "Parking", None),
+    # Entertainment
+    "movie": ("Entertainment", "Movies", None), "movies": ("Entertainment", "Movies", None),
+    "netflix": ("Entertainment", "Streaming", None), "concert": ("Entertainment", "Concert", None),
+    # Shopping
+    "shirt": ("Shopping", "Clothes", None), "clothes": ("Shopping", "Clothes", None),
+    "shoes": ("Shopping", "Shoes", None), "amazon": ("Shopping", "Online", None),
+    "flipkart": ("Shopping", "Online", None), "shopping": ("Shopping", "Shopping", None),
+    # Utilities
+    "electricity": ("Utilities", "Electricity", None), "recharge": ("Utilities", "Mobile", None),
+    "internet": ("Utilities", "Internet", None), "wifi": ("Utilities", "Internet", None),
+    # Healthcare
+    "medicine": ("Healthcare", "Medicine", None), "medicines": ("Healthcare", "Medicine", None),
+    "doctor": ("Healthcare", "Doctor", None), "pharmacy": ("Healthcare", "Medicine", None),
+    # Housing / Education
+    "rent": ("Housing", "Rent", None),
+    "books": ("Education", "Books", None), "tuition": ("Education", "Tuition", None),
+    # Income
+    "salary": ("Income", "Salary", "Credit"), "freelance": ("Income", "Freelance", "Credit"),
+    "freelancing": ("Income", "Freelance", "Credit"), "bonus": ("Income", "Bonus", "Credit"),
+}
+
+
+class FastIntentClassifier:
+    """
+    Deterministic pre-classifier. classify() returns a classification dict in the
+    same shape as the Gemini classifier (plus "confidence" and "source") or None
+    when the message should go to the LLM.
+    """
+
+    def __init__(self, min_confidence: float = 0.85):
+        self.min_confidence = min_confidence
+
+        # Metrics
+        self.attempts = 0
+        self.hits = {"greeting": 0, "transaction": 0}
+
+    def classify(self, user_message: str, today):
+        self.attempts += 1
+        result = self._match_greeting(user_message) or self._match_transaction(user_message, today)
+        if result is None or result["confidence"] < self.min_confidence:
+            return None
+        self.hits[result["intent"]] += 1
+        result["source"] = "fast_path"
+        return result
+
+    def _match_greeting(self, user_message: str):
+        text = re.sub(r"[^a-z ]+", " ", user_message.lower())
+        text = re.sub(r"\s+", " ", text).strip()
+        if not text:
+            return None
+        if GREETING_PATTERN.match(text):
+            return {"intent": "greeting", "response": GREETING_RESPONSE, "confidence": 0.95}
+        if THANKS_PATTERN.match(text):
+            return {"intent": "greeting", "response": THANKS_RESPONSE, "confidence": 0.95}
+        return None
+
+    def _match_transaction(self, user_message: str, today):
+        text = user_message.lower()
+        if "?" in text:
+            return None
+
+        amounts = list(AMOUNT_PATTERN.finditer(text))
+        if len(amounts) != 1:
+            return None
+        number, suffix = amounts[0].groups()
+        # A number glued to some other unit ("5kg", "2pcs") is not clearly an amount of money
+        if UNIT_AFTER_AMOUNT.match(text, amounts[0].end()):
+            return None
+        amount = Decimal(number.replace(",", "")) * AMOUNT_MULTIPLIERS.get(suffix, 1)
+        if amount <= 0:
+            return None
+
+        words = re.findall(r"[a-z]+", text.replace("'", ""))
+        word_set = set(words)
+        if word_set & (QUESTION_WORDS | NEGATION_WORDS | INTENTION_WORDS | DATE_WORDS):
+            return None
+
+        debit = bool(word_set & DEBIT_VERBS)
+        credit = bool(word_set & CREDIT_VERBS)
+        categories = {CATEGORY_KEYWORDS[w] for w in words if w in CATEGORY_KEYWORDS}
+        if debit and credit or len(categories) != 1:
+            return None
+        category_name, subcategory_name, implied_type = categories.pop()
+
+        # Income keywords must come with income verbs and vice versa
+        if implied_type == "Credit" and debit or credit and implied_type != "Credit":
+            return None
+        transaction_type = "Credit" if credit or implied_type == "Credit" else "Debit"
+
+        confidence = 0.5 + 0.2  # one amount + one category keyword
+        if debit or credit:
+            confidence += 0.2
+        if CURRENCY_PATTERN.search(text):
+            confidence += 0.1
+        elif implied_type == "Credit":
+            confidence += 0.05
+
+        if {"today", "yesterday"} <= word_set:
+            return None
+        transaction_date = today - timedelta(days=1) if "yesterday" in word_set else today
+
+        return {
+            "intent": "transaction",
+            "transactions": [{
+                "transaction_type": transaction_type,
+                "amount": int(amount) if amount == amount.to_integral_value() else float(amount),
+                "category_name": category_name,
+                "subcategory_name": subcategory_name,
+                "transaction_date": transaction_date.strftime("%Y-%m-%d"),
+            }],
+            "confidence": round(min(confidence, 1.0), 2),
+        }
+
+    def stats(self) -> dict:
+        total_hits = sum(self.hits.values())
+        return {
+            "attempts": self.attempts,
+            "hits": total_hits,
+            "hits_by_intent": dict(self.hits),
+            "llm_fallbacks": self.attempts - total_hits,
+            "hit_rate": round(total_hits / self.attempts, 4) if self.attempts else 0.0,
+            "min_confidence": self.min_confidence,
+        }
@@ -295,9 +295,10 @@ import sys
 from termcolor import cprint
 
 # Import database functions
-from add_data_in_database import get_user_financial_data, add_user, add_interaction, TransactionType
+from add_data_in_database import get_user_financial_data, add_user, add_interactions_batch, TransactionType
 from weekly_report import WeeklyReport
 from transaction_history import TransactionHistory
+from state_backend import InMemoryStateBackend
 
 class GeminiChat:
     def __init__(self):
@@ -317,29 +318,21 @@ class GeminiChat:
         self.weekReport_obj = WeeklyReport(self.chat_model)
         self.transactionHistory_obj = TransactionHistory(self.chat_model)
         
-        # Initialize chat history storage for each user
-        self.chat_histories = {}  # {user_id: [messages]}
+        # Chat history for each user, in bounded per-user ring buffers (idle users are evicted)
         self.max_history_length = 20  # Keep last 20 messages to avoid token limits
+        self.state = InMemoryStateBackend(max_history_length=self.max_history_length)
 
     def get_chat_history(self, user_id: int):
         """Get chat history for a specific user"""
-        return self.chat_histories.get(user_id, [])
+        return self.state.get_chat_history(user_id)
 
     def add_to_chat_history(self, user_id: int, message):
         """Add a message to user's chat history"""
-        if user_id not in self.chat_histories:
-            self.chat_histories[user_id] = []
-        
-        self.chat_histories[user_id].append(message)
-        
-        # Keep only the last N messages to avoid token limit issues
-        if len(self.chat_histories[user_id]) > self.max_history_length:
-            self.chat_histories[user_id] = self.chat_histories[user_id][-self.max_history_length:]
+        self.state.append_chat_message(user_id, message)
 
     def clear_chat_history(self, user_id: int):
         """Clear chat history for a specific user"""
-        if user_id in self.chat_histories:
-            del self.chat_histories[user_id]
+        self.state.clear_chat_history(user_id)
 
     def extract_json(self, text):
         try:
@@ -532,6 +525,8 @@ class GeminiChat:
                 
             if "transaction" in ai_response:
                 transactions = ai_response["transaction"]
+                translated_msg = ai_response.get("translated_message", user_message)
+                rows = []
                 for transaction in transactions:
                     transaction_type_enum = None
                     if transaction.get("transaction_type"):
@@ -549,16 +544,16 @@ class GeminiChat:
                         except ValueError:
                             print(f"Invalid date format: {transaction['transaction_date']}")
 
-                    translated_msg = ai_response.get("translated_message", user_message)
-                    add_interaction(
-                        user_id=user_id,
-                        message_text=translated_msg,
-                        transaction_type=transaction_type_enum,
-                        amount=transaction.get("amount"),
-                        category_name=transaction.get("category_name"),
-                        subcategory_name=transaction.get("subcategory_name"),
-                        transaction_date=transaction_date
-                    )
+                    rows.append({
+                        "message_text": translated_msg,
+                        "transaction_type": transaction_type_enum,
+                        "amount": transaction.get("amount"),
+                        "category_name": transaction.get("category_name"),
+                        "subcategory_name": transaction.get("subcategory_name"),
+                        "transaction_date": transaction_date
+                    })
+
+                add_interactions_batch(user_id, rows, from_one_message=True)
 
                 success_msg = f"Stored {len(transactions)} transaction(s) successfully!"
                 response_text = f"{response_text}\n{success_msg}" if response_text else success_msg
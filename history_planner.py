@@ -0,0 +1,58 @@
+"""
+Query planner for transaction_history questions
+
+Turns the classifier's query_type, category_filter and search_text into a small
+plan of targeted queries - a filtered SUM, a GROUP BY category, a top-N or the
+latest rows - so the prompt only carries a bounded result set however long the
+user's history is.
+"""
+
+TRANSACTION_TYPE_BY_QUERY = {"expenses": "Debit", "income": "Credit"}
+TOP_N = 5
+
+
+def plan_history_query(query_info: dict, max_rows: int) -> dict:
+    """
+    Plan for one history question:
+      transaction_type / category - filters for the totals (None = everything)
+      rows - which rows to fetch: "search", "largest", "recent" or None
+      rows_transaction_type, row_limit, rows_title - how to fetch and label them
+      show_breakdown - include the expense GROUP BY category
+      scope - human-readable description of what the totals cover
+    """
+    query_type = query_info.get("query_type") or "general"
+    category = (query_info.get("category_filter") or "").strip() or None
+    search_text = (query_info.get("search_text") or "").strip() or None
+    transaction_type = TRANSACTION_TYPE_BY_QUERY.get(query_type)
+
+    plan = {
+        "query_type": query_type,
+        "transaction_type": transaction_type,
+        "category": category,
+        "search_text": search_text,
+        "rows": "recent",
+        "rows_transaction_type": transaction_type,
+        "row_limit": max_rows,
+        "rows_title": "LATEST TRANSACTIONS",
+        "show_breakdown": query_type in ("expenses", "report", "category_wise"),
+    }
+
+    if search_text:
+        plan.update(rows="search", rows_title=f'TRANSACTIONS MENTIONING "{search_text}"')
+    elif query_type in ("expenses", "income", "report"):
+        # Reports highlight the biggest spends; expenses/income the biggest of that type
+        rows_transaction_type = transaction_type or "Debit"
+        label = "INCOME ENTRIES" if rows_transaction_type == "Credit" else "EXPENSES"
+        plan.update(rows="largest", rows_transaction_type=rows_transaction_type, row_limit=TOP_N,
+                    rows_title=f"TOP {TOP_N} LARGEST {label}")
+    elif query_type == "category_wise":
+        # The GROUP BY is the answer; no individual rows needed
+        plan.update(rows=None, row_limit=0, rows_title=None)
+
+    subject = {"Debit": "expenses", "Credit": "income"}.get(transaction_type, "all transactions")
+    if category:
+        subject += f" in {category}"
+    if search_text:
+        subject += f' mentioning "{search_text}"'
+    plan["scope"] = subject
+    return plan
@@ -8,20 +8,25 @@ import os
 import sys
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from add_data_in_database import Base, engine, SessionLocal
+from add_data_in_database import SessionLocal, create_tables, rebuild_rollups
 
 def init_database():
     """Initialize database tables"""
     try:
         print("🔄 Initializing database...")
         
-        # Create all tables
-        Base.metadata.create_all(engine)
+        # Create all tables and apply pending schema migrations
+        schema_version = create_tables()
         
         print("✅ Database tables created successfully!")
+        print(f"🧬 Schema version: {schema_version}")
         print("📊 Tables created:")
         print("   - users")
         print("   - user_interactions")
+        print("   - categories")
+        print("   - subcategories")
+        print("   - interaction_rollups")
+        print("   - schema_migrations")
         
         # Test database connection
         session = SessionLocal()
@@ -43,6 +48,19 @@ def init_database():
         print(f"❌ Error initializing database: {e}")
         return False
 
+def rebuild_rollup_table():
+    """Recompute interaction_rollups from user_interactions"""
+    try:
+        print("🔄 Rebuilding rollups...")
+        rows = rebuild_rollups()
+        print(f"✅ Rollups rebuilt: {rows} rows")
+        return True
+    except Exception as e:
+        print(f"❌ Error rebuilding rollups: {e}")
+        return False
+
 if __name__ == "__main__":
     success = init_database()
+    if success and "--rebuild-rollups" in sys.argv:
+        success = rebuild_rollup_table()
     sys.exit(0 if success else 1)
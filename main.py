@@ -5,12 +5,23 @@ WhatsApp Financial Bot - Main Server
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
-import requests
+import httpx
 import os
 from dotenv import load_dotenv
 import json
 import asyncio
 from enhanced_financial_bot import EnhancedFinancialBot
+from message_queue import MessageQueue
+from state_backend import create_state_backend
+from add_data_in_database import financial_data_cache, user_id_cache, preload_user_ids
+import async_database
+from config import (
+    WEBHOOK_WORKERS, WEBHOOK_QUEUE_MAXSIZE, WEBHOOK_JOBS_PER_TURN, WEBHOOK_MAX_PENDING_PER_USER,
+    DEDUP_MAX_SIZE, DEDUP_TTL_SECONDS, DEDUP_DB_PATH,
+    STATE_BACKEND, STATE_DB_PATH, STATE_LEASE_TTL, CHAT_HISTORY_LENGTH, CHAT_STORE_MAX_USERS, CHAT_STORE_IDLE_TTL, CHAT_STORE_MAX_BYTES,
+    WHAPI_TIMEOUT, WHAPI_CONNECT_TIMEOUT, WHAPI_TYPING_TIMEOUT,
+    WHAPI_MAX_CONNECTIONS, WHAPI_MAX_KEEPALIVE, WHAPI_KEEPALIVE_EXPIRY, USER_ID_CACHE_PRELOAD
+)
 import logging
 
 # Load environment variables
@@ -32,6 +43,22 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
 
+    if USER_ID_CACHE_PRELOAD:
+        loaded = await asyncio.to_thread(preload_user_ids)
+        logger.info(f"Preloaded {loaded} user IDs")
+
+    await whatsapp_handler.start()
+    await message_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain the background message queue and close the WhatsApp client on shutdown"""
+    await message_queue.stop()
+    await whatsapp_handler.close()
+    processed_messages.close()
+    state_backend.close()
+    await async_database.dispose()
+
 # WhatsApp API Configuration
 WHAPI_TOKEN = os.getenv("WHAPI_TOKEN", "5neaxPl90yIwcH62CaCd7qesx6DNkylZ")
 WHAPI_BASE_URL = "https://gate.whapi.cloud"
@@ -42,11 +69,36 @@ from add_data_in_database import create_tables
 create_tables()
 logger.info("Database tables initialized successfully")
 
+# Conversation state (chat history + dedup), shared between workers with the sqlite backend
+state_backend = create_state_backend(
+    STATE_BACKEND, db_path=STATE_DB_PATH, max_history_length=CHAT_HISTORY_LENGTH, lease_ttl=STATE_LEASE_TTL,
+    max_users=CHAT_STORE_MAX_USERS, idle_ttl=CHAT_STORE_IDLE_TTL, max_bytes=CHAT_STORE_MAX_BYTES
+)
+logger.info(f"Using {state_backend.name} state backend")
+
 # Initialize the financial bot
-financial_bot = EnhancedFinancialBot()
+financial_bot = EnhancedFinancialBot(state_backend=state_backend)
 
 # Message deduplication to prevent double responses
-processed_messages = set()
+processed_messages = state_backend.create_deduplicator(
+    max_size=DEDUP_MAX_SIZE,
+    ttl_seconds=DEDUP_TTL_SECONDS,
+    db_path=DEDUP_DB_PATH or None
+)
+
+# Background workers that process messages after the webhook is acknowledged
+message_queue = MessageQueue(
+    num_workers=WEBHOOK_WORKERS,
+    max_size=WEBHOOK_QUEUE_MAXSIZE,
+    jobs_per_turn=WEBHOOK_JOBS_PER_TURN,
+    max_pending_per_key=WEBHOOK_MAX_PENDING_PER_USER
+)
+
+async def run_blocking(blocking: bool, fn, *args):
+    """Call fn(*args), in a thread when it may block on SQLite file locks so the event loop keeps serving"""
+    if blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
 
 class WhatsAppHandler:
     def __init__(self):
@@ -56,18 +108,46 @@ class WhatsAppHandler:
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
+        self.client = None
+
+    async def start(self):
+        """Create the shared keep-alive HTTP client for gate.whapi.cloud"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=httpx.Timeout(WHAPI_TIMEOUT, connect=WHAPI_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=WHAPI_MAX_CONNECTIONS,
+                    max_keepalive_connections=WHAPI_MAX_KEEPALIVE,
+                    keepalive_expiry=WHAPI_KEEPALIVE_EXPIRY
+                )
+            )
+            logger.info("WhatsApp HTTP client started")
+
+    async def close(self):
+        """Close the shared HTTP client and its pooled connections"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            logger.info("WhatsApp HTTP client closed")
+
+    async def _post(self, path: str, payload: dict, timeout: float = None):
+        if self.client is None:
+            await self.start()
+        if timeout is None:
+            return await self.client.post(path, json=payload)
+        return await self.client.post(path, json=payload, timeout=timeout)
 
     async def send_message(self, phone_number: str, message: str):
         """Send a message to WhatsApp number via whapi.cloud"""
         try:
-            url = f"{self.base_url}/messages/text"
-            
             payload = {
                 "to": phone_number,
                 "body": message
             }
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = await self._post("/messages/text", payload)
             
             if response.status_code == 200:
                 logger.info(f"Message sent successfully to {phone_number}")
@@ -83,14 +163,13 @@ class WhatsAppHandler:
     async def send_typing_indicator(self, phone_number: str):
         """Send typing indicator to show bot is processing"""
         try:
-            url = f"{self.base_url}/messages/typing"
-            
             payload = {
                 "to": phone_number,
                 "typing": True
             }
             
-            requests.post(url, headers=self.headers, json=payload)
+            # Best effort - don't hold up the reply for a slow typing indicator
+            await self._post("/messages/typing", payload, timeout=WHAPI_TYPING_TIMEOUT)
         except Exception as e:
             logger.error(f"Error sending typing indicator: {e}")
 
@@ -132,9 +211,23 @@ async def handle_webhook(request: Request):
         body = await request.json()
         logger.info(f"Received webhook: {json.dumps(body, indent=2)}")
         
+        dropped = 0
         if "messages" in body:
             for message_data in body["messages"]:
-                await process_whatsapp_message(message_data)
+                # Check for duplicate messages before queueing any work
+                message_id = message_data.get("id")
+                if await run_blocking(processed_messages.blocking, processed_messages.is_duplicate, message_id):
+                    logger.info(f"Skipping duplicate message: {message_id}")
+                    continue
+                
+                # Messages from the same number run in order; different numbers run in parallel
+                if not message_queue.enqueue(process_whatsapp_message, message_data, key=message_data.get("from")):
+                    await run_blocking(processed_messages.blocking, processed_messages.forget, message_id)
+                    dropped += 1
+        
+        if dropped:
+            # Ask whapi to redeliver later instead of silently losing messages
+            return JSONResponse(content={"status": "busy", "dropped": dropped}, status_code=503)
         
         return JSONResponse(content={"status": "success"}, status_code=200)
         
@@ -147,19 +240,6 @@ async def process_whatsapp_message(message_data: dict):
     try:
         message_type = message_data.get("type")
         from_number = message_data.get("from")
-        message_id = message_data.get("id")
-        
-        # Check for duplicate messages
-        if message_id in processed_messages:
-            logger.info(f"Skipping duplicate message: {message_id}")
-            return
-        
-        # Add to processed messages
-        processed_messages.add(message_id)
-        
-        # Clean old processed messages (keep only last 100)
-        if len(processed_messages) > 100:
-            processed_messages.clear()
         
         # Only process text messages
         if message_type != "text":
@@ -174,14 +254,16 @@ async def process_whatsapp_message(message_data: dict):
         
         logger.info(f"Processing message from {from_number}: {message_text}")
         
-        # Send typing indicator
-        await whatsapp_handler.send_typing_indicator(from_number)
-        
-        # Process message with financial bot
-        bot_response = financial_bot.process_message(message_text, from_number)
-        
-        # Send response back to user
-        success = await whatsapp_handler.send_message(from_number, bot_response)
+        # One message per user at a time across worker processes (the queue only orders within this one)
+        async with state_backend.user_lease(from_number):
+            # Send typing indicator
+            await whatsapp_handler.send_typing_indicator(from_number)
+            
+            # Process message with financial bot
+            bot_response = await financial_bot.aprocess_message(message_text, from_number)
+            
+            # Send response back to user
+            success = await whatsapp_handler.send_message(from_number, bot_response)
         
         if success:
             logger.info(f"Response sent to {from_number}")
@@ -206,6 +288,20 @@ async def health_check():
         "timestamp": financial_bot.today.isoformat()
     }
 
+@app.get("/stats")
+async def stats():
+    """Runtime metrics for the message processing pipeline"""
+    return {
+        "state_backend": state_backend.name,
+        "chat_store": await run_blocking(state_backend.blocking, state_backend.stats),
+        "queue": message_queue.stats(),
+        "dedup": processed_messages.stats(),
+        "fast_intent": financial_bot.fast_classifier.stats() if financial_bot.fast_classifier else None,
+        "search_cache": financial_bot.search_cache.stats(),
+        "financial_data_cache": financial_data_cache.stats(),
+        "user_id_cache": user_id_cache.stats()
+    }
+
 if __name__ == "__main__":
     if not WHAPI_TOKEN:
         logger.error("WHAPI_TOKEN not found in environment variables!")
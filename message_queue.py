@@ -0,0 +1,178 @@
+"""
+In-process background job queue for webhook message processing
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class MessageQueue:
+    """
+    Bounded job queue drained by a fixed pool of worker tasks, ordered per key.
+
+    The webhook handler enqueues jobs and returns straight away; the workers
+    run them in the background and keep track of queue depth, wait time and
+    utilisation so they can be exposed on the stats endpoint.
+
+    Jobs that share a key (the sender's WhatsApp number) run one at a time in
+    arrival order, while different keys run in parallel. A worker owns one key
+    at a time, so num_workers is also the maximum number of users in flight.
+    For fairness a worker runs at most jobs_per_turn jobs for a key before
+    sending it to the back of the line, and a single key can have at most
+    max_pending_per_key jobs waiting.
+    """
+
+    def __init__(self, num_workers: int = 4, max_size: int = 1000, jobs_per_turn: int = 1,
+                 max_pending_per_key: int = 50, wait_samples: int = 1000):
+        self.num_workers = max(1, num_workers)
+        self.max_size = max_size
+        self.jobs_per_turn = max(1, jobs_per_turn)
+        self.max_pending_per_key = max_pending_per_key
+        self._ready = None  # keys with pending jobs that no worker owns, in turn order
+        self._pending = {}  # key -> deque of (handler, args, enqueued_at)
+        self._active = set()  # keys currently owned by a worker
+        self._depth = 0
+        self._idle = None
+        self._workers = []
+        self._started_at = None
+        self._anonymous_keys = itertools.count()
+
+        # Metrics
+        self._busy_workers = 0
+        self._busy_seconds = 0.0
+        self._wait_times = deque(maxlen=wait_samples)
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        """Create the queue and spawn the worker tasks"""
+        if self.running:
+            return
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._started_at = time.monotonic()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"message-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        logger.info(f"Message queue started with {self.num_workers} workers (max size {self.max_size})")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Wait for queued jobs to finish (up to drain_timeout) and cancel the workers"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Message queue stopped with {self._depth} jobs still pending")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Message queue stopped")
+
+    def enqueue(self, handler, *args, key=None) -> bool:
+        """
+        Schedule handler(*args) to run on a worker after earlier jobs with the same key.
+        Returns False if the queue (or the key's share of it) is full.
+        """
+        if not self.running:
+            raise RuntimeError("Message queue is not running")
+        if key is None:
+            key = ("anonymous", next(self._anonymous_keys))
+
+        jobs = self._pending.get(key)
+        if self._depth >= self.max_size:
+            self.dropped += 1
+            logger.error(f"Message queue full ({self.max_size} jobs), dropping job")
+            return False
+        if jobs is not None and len(jobs) >= self.max_pending_per_key:
+            self.dropped += 1
+            logger.error(f"Too many pending jobs for {key} ({self.max_pending_per_key}), dropping job")
+            return False
+
+        if jobs is None:
+            jobs = self._pending[key] = deque()
+        jobs.append((handler, args, time.monotonic()))
+        self._depth += 1
+        self._idle.clear()
+        self.enqueued += 1
+
+        # A key goes on the ready line when it gets its first job and no worker owns it
+        if len(jobs) == 1 and key not in self._active:
+            self._ready.put_nowait(key)
+        return True
+
+    async def _worker(self, worker_id: int):
+        while True:
+            key = await self._ready.get()
+            self._active.add(key)
+            jobs = self._pending[key]
+            try:
+                for _ in range(self.jobs_per_turn):
+                    if not jobs:
+                        break
+                    await self._run(worker_id, *jobs.popleft())
+            finally:
+                self._active.discard(key)
+                if jobs:
+                    # Back of the line so other users get their turn
+                    self._ready.put_nowait(key)
+                else:
+                    del self._pending[key]
+
+    async def _run(self, worker_id: int, handler, args, enqueued_at: float):
+        started_at = time.monotonic()
+        self._wait_times.append(started_at - enqueued_at)
+        self._busy_workers += 1
+        try:
+            await handler(*args)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Worker {worker_id} job failed: {e}")
+        finally:
+            self._busy_workers -= 1
+            self._busy_seconds += time.monotonic() - started_at
+            self._depth -= 1
+            if self._depth == 0:
+                self._idle.set()
+
+    def stats(self) -> dict:
+        """Queue depth, wait time and worker utilisation snapshot"""
+        waits = sorted(self._wait_times)
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        capacity = uptime * self.num_workers
+
+        return {
+            "running": self.running,
+            "workers": self.num_workers,
+            "busy_workers": self._busy_workers,
+            "utilisation": round(self._busy_seconds / capacity, 4) if capacity else 0.0,
+            "depth": self._depth,
+            "max_size": self.max_size,
+            "active_keys": len(self._active),
+            "waiting_keys": self._ready.qsize() if self._ready else 0,
+            "jobs_per_turn": self.jobs_per_turn,
+            "max_pending_per_key": self.max_pending_per_key,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+            "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0.0,
+            "max_wait_ms": round(waits[-1] * 1000, 2) if waits else 0.0,
+        }
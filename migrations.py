@@ -0,0 +1,153 @@
+"""
+Versioned schema migrations for the financial bot database
+
+Each migration runs once, in version order, inside its own transaction and is
+recorded in the schema_migrations table. create_tables() runs any pending
+migrations, so existing financial_bot.db files are upgraded in place.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """Register a migration function for the given schema version"""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+@migration(1, "Composite index on user_interactions (user_id, transaction_date)")
+def add_user_date_index(conn):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_user_interactions_user_date "
+        "ON user_interactions (user_id, transaction_date)"
+    ))
+
+
+@migration(2, "Backfill interaction_rollups from existing user_interactions")
+def backfill_interaction_rollups(conn):
+    # Superseded by migration 3, which recreates and rebuilds the rollups in the paise/id format
+    pass
+
+
+@migration(3, "Store amounts as integer paise and categories/subcategories as interned ids")
+def normalize_interaction_storage(conn):
+    # Models imported here to avoid a circular import; create_all() has already made the new tables
+    from add_data_in_database import UserInteraction, InteractionRollup, rebuild_rollups
+
+    legacy_columns = {column["name"] for column in inspect(conn).get_columns("user_interactions")}
+    if "amount" in legacy_columns:
+        # Intern the distinct names
+        conn.execute(text(
+            "INSERT INTO categories (name) SELECT DISTINCT category_name FROM user_interactions "
+            "WHERE category_name IS NOT NULL AND category_name NOT IN (SELECT name FROM categories)"
+        ))
+        conn.execute(text(
+            "INSERT INTO subcategories (name) SELECT DISTINCT subcategory_name FROM user_interactions "
+            "WHERE subcategory_name IS NOT NULL AND subcategory_name NOT IN (SELECT name FROM subcategories)"
+        ))
+
+        # Rebuild user_interactions in the new format, keeping interaction ids
+        conn.execute(text("DROP INDEX IF EXISTS ix_user_interactions_user_date"))
+        conn.execute(text("ALTER TABLE user_interactions RENAME TO user_interactions_legacy"))
+        UserInteraction.__table__.create(conn)
+        conn.execute(text(
+            "INSERT INTO user_interactions (interaction_id, user_id, message_text, transaction_type, "
+            "amount_paise, category_id, subcategory_id, transaction_date, processed_at) "
+            "SELECT i.interaction_id, i.user_id, i.message_text, i.transaction_type, "
+            "CAST(ROUND(i.amount * 100) AS INTEGER), c.category_id, s.subcategory_id, i.transaction_date, i.processed_at "
+            "FROM user_interactions_legacy i "
+            "LEFT JOIN categories c ON c.name = i.category_name "
+            "LEFT JOIN subcategories s ON s.name = i.subcategory_name"
+        ))
+        conn.execute(text("DROP TABLE user_interactions_legacy"))
+
+    rollup_columns = {column["name"] for column in inspect(conn).get_columns("interaction_rollups")}
+    if "total_paise" not in rollup_columns:
+        InteractionRollup.__table__.drop(conn)
+        InteractionRollup.__table__.create(conn)
+    rebuild_rollups(conn)
+
+
+@migration(4, "FTS5 keyword index over message_text and subcategory names")
+def add_interaction_search_index(conn):
+    if conn.dialect.name != "sqlite":
+        # search_user_transactions falls back to LIKE on other databases
+        return
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS interaction_search "
+        "USING fts5(message_text, subcategory_name, tokenize='unicode61 remove_diacritics 2')"
+    ))
+    # rowid mirrors user_interactions.interaction_id
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS user_interactions_search_insert AFTER INSERT ON user_interactions BEGIN "
+        "INSERT INTO interaction_search (rowid, message_text, subcategory_name) VALUES (new.interaction_id, new.message_text, "
+        "(SELECT name FROM subcategories WHERE subcategory_id = new.subcategory_id)); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS user_interactions_search_update AFTER UPDATE ON user_interactions BEGIN "
+        "DELETE FROM interaction_search WHERE rowid = old.interaction_id; "
+        "INSERT INTO interaction_search (rowid, message_text, subcategory_name) VALUES (new.interaction_id, new.message_text, "
+        "(SELECT name FROM subcategories WHERE subcategory_id = new.subcategory_id)); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS user_interactions_search_delete AFTER DELETE ON user_interactions BEGIN "
+        "DELETE FROM interaction_search WHERE rowid = old.interaction_id; END"
+    ))
+    conn.execute(text("DELETE FROM interaction_search"))
+    conn.execute(text(
+        "INSERT INTO interaction_search (rowid, message_text, subcategory_name) "
+        "SELECT i.interaction_id, i.message_text, s.name FROM user_interactions i "
+        "LEFT JOIN subcategories s ON s.subcategory_id = i.subcategory_id"
+    ))
+
+
+@migration(5, "Count the transactions recorded from each message so keyword search can tell them apart")
+def add_message_transaction_count(conn):
+    # Existing rows keep the default of 1: shared text and write time also match separate
+    # messages (repeated "chai 20" entries, bulk loads), so they cannot be grouped after the fact
+    columns = {column["name"] for column in inspect(conn).get_columns("user_interactions")}
+    if "message_transaction_count" not in columns:
+        conn.execute(text(
+            "ALTER TABLE user_interactions ADD COLUMN message_transaction_count INTEGER NOT NULL DEFAULT 1"
+        ))
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def run_migrations(engine) -> int:
+    """Apply pending migrations and return the resulting schema version"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description TEXT NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        current = get_schema_version(conn)
+
+    for version, description, fn in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            with engine.begin() as conn:
+                # Another worker process may have applied it since we last looked
+                if get_schema_version(conn) < version:
+                    fn(conn)
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                        {"version": version, "description": description}
+                    )
+                    print(f"Applied migration {version}: {description}")
+        except IntegrityError:
+            print(f"Migration {version} already applied by another process")
+        current = version
+
+    return current
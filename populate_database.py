@@ -3,7 +3,7 @@
 Script to populate the financial bot database with realistic transaction data
 """
 
-from add_data_in_database import add_user, add_interaction, TransactionType, create_tables
+from add_data_in_database import add_user, add_interactions_batch, TransactionType, create_tables
 from datetime import datetime, timedelta, date
 import random
 
@@ -215,35 +215,37 @@ def populate_sample_data():
         }
     ]
     
-    # Add transactions to database
+    # Add transactions to database, one batch per user
     today = date.today()
+    rows_by_user = {}
     
-    for i, transaction in enumerate(transactions, 1):
+    for transaction in transactions:
         transaction_date = today - timedelta(days=transaction["days_ago"])
         
-        add_interaction(
-            user_id=transaction["user_id"],
-            message_text=transaction["message"],
-            transaction_type=transaction["transaction_type"],
-            amount=transaction["amount"],
-            category_name=transaction["category"],
-            subcategory_name=transaction["subcategory"],
-            transaction_date=transaction_date
-        )
-        
-        print(f"Added transaction {i}/20: {transaction['message']}")
+        rows_by_user.setdefault(transaction["user_id"], []).append({
+            "message_text": transaction["message"],
+            "transaction_type": transaction["transaction_type"],
+            "amount": transaction["amount"],
+            "category_name": transaction["category"],
+            "subcategory_name": transaction["subcategory"],
+            "transaction_date": transaction_date
+        })
+    
+    for user_id, rows in rows_by_user.items():
+        added = add_interactions_batch(user_id, rows)
+        print(f"Added {added}/{len(rows)} transactions for user {user_id}")
     
     print(f"\n✅ Successfully added {len(transactions)} transactions to the database!")
     print("🎯 Database is now populated with realistic financial data")
     
     # Show summary
-    from add_data_in_database import get_user_financial_data
+    from add_data_in_database import get_user_financial_summary
     
     print("\n📊 SUMMARY OF RECENT TRANSACTIONS (Last 7 days):")
     for user_id in user_ids:
         week_start = today - timedelta(days=7)
-        data = get_user_financial_data(user_id, week_start, today)
-        if data and data['transactions']:
+        data = get_user_financial_summary(user_id, week_start, today)
+        if data and data['transaction_count']:
             print(f"\n👤 User {user_id}:")
             print(f"   💸 Total Expenses: ₹{data['total_expenses']}")
             print(f"   💰 Total Income: ₹{data['total_income']}")
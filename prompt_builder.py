@@ -0,0 +1,133 @@
+"""
+Token-budgeted prompt assembly for the LLM call sites
+
+A prompt is fixed text plus data sections (lists of rows, most important first).
+build() keeps every fixed part, fills the remaining per-intent token budget with
+as many rows as fit - dropping the rest with a note saying how many were left out -
+and logs the estimated size of the finished prompt.
+"""
+
+import logging
+
+from config import (
+    PROMPT_TOKEN_BUDGET_CLASSIFIER, PROMPT_TOKEN_BUDGET_HISTORY, PROMPT_TOKEN_BUDGET_REPORT
+)
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio for Gemini on mixed English/number text
+CHARS_PER_TOKEN = 4
+
+PROMPT_TOKEN_BUDGETS = {
+    "classifier": PROMPT_TOKEN_BUDGET_CLASSIFIER,
+    "transaction_history": PROMPT_TOKEN_BUDGET_HISTORY,
+    "weekly_report": PROMPT_TOKEN_BUDGET_REPORT,
+    "history_report": PROMPT_TOKEN_BUDGET_REPORT,
+    "follow_up": PROMPT_TOKEN_BUDGET_HISTORY,
+    "transaction_ack": PROMPT_TOKEN_BUDGET_CLASSIFIER,
+    "financial_info": PROMPT_TOKEN_BUDGET_CLASSIFIER,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated token count of a prompt (no tokenizer round trip)"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class PromptBuilder:
+    """
+    Assemble a prompt within a token budget.
+
+        prompt = PromptBuilder("weekly_report")
+        prompt.add("header ...")
+        prompt.add_rows(rows, omitted="... {count} smaller transactions not shown")
+        prompt.add("instructions ...")
+        text = prompt.build()
+
+    Row sections are filled in the order they were added.
+    """
+
+    def __init__(self, intent: str, budget: int = None):
+        self.intent = intent
+        self.budget = budget if budget is not None else PROMPT_TOKEN_BUDGETS[intent]
+        self._parts = []
+
+    def add(self, text: str):
+        """Fixed text, always included"""
+        self._parts.append(("text", text))
+        return self
+
+    def add_rows(self, rows, omitted: str = "... {count} more rows not shown"):
+        """A data section of one row per line, trimmed to whatever budget the fixed text leaves"""
+        self._parts.append(("rows", (list(rows), omitted)))
+        return self
+
+    def build(self) -> str:
+        fixed_tokens = sum(estimate_tokens(part) for kind, part in self._parts if kind == "text")
+        remaining = self.budget - fixed_tokens
+        dropped = 0
+
+        pieces = []
+        for kind, part in self._parts:
+            if kind == "text":
+                pieces.append(part)
+                continue
+
+            rows, omitted = part
+            kept = []
+            for row in rows:
+                cost = estimate_tokens(row + "\n")
+                if cost > remaining:
+                    break
+                kept.append(row)
+                remaining -= cost
+
+            lines = kept
+            if len(kept) < len(rows):
+                dropped += len(rows) - len(kept)
+                note = omitted.format(count=len(rows) - len(kept))
+                lines = kept + [note]
+            if lines:
+                pieces.append("\n".join(lines) + "\n")
+
+        prompt = "".join(pieces)
+        tokens = estimate_tokens(prompt)
+        trimmed = f", {dropped} rows trimmed" if dropped else ""
+        logger.info(f"Prompt [{self.intent}]: ~{tokens} tokens (budget {self.budget}{trimmed})")
+        return prompt
+
+
+# Compact encoding of get_user_financial_data output: one header, only the columns the
+# model uses, whole-rupee amounts signed + for income and - for expenses
+TRANSACTION_COLUMNS = "date|amount|category|item"
+
+
+def encode_transaction(row: dict) -> str:
+    sign = "+" if row['transaction_type'] == "Credit" else "-"
+    return (f"{row['transaction_date'] or ''}|{sign}{round(row['amount'] or 0)}|"
+            f"{row['category_name'] or 'Uncategorized'}|{row['subcategory_name'] or ''}")
+
+
+def encode_aggregates(data: dict) -> str:
+    breakdown = sorted(data['category_breakdown'].items(), key=lambda item: (-item[1], item[0]))
+    return (
+        f"totals: expenses={round(data['total_expenses'])}|income={round(data['total_income'])}"
+        f"|transactions={len(data['transactions'])}|days={data['period_days']}\n"
+        f"expenses by category: {'|'.join(f'{name}={round(amount)}' for name, amount in breakdown)}\n"
+    )
+
+
+def add_financial_data(prompt: PromptBuilder, data: dict):
+    """
+    Add get_user_financial_data output: the aggregates in full, then the transactions
+    largest first, so a tight budget keeps the top-N rows.
+    """
+    prompt.add(encode_aggregates(data))
+
+    transactions = sorted(data['transactions'], key=lambda row: (-(row['amount'] or 0), row['interaction_id']))
+    prompt.add(f"TRANSACTIONS, largest first ({TRANSACTION_COLUMNS}; + income, - expense):\n")
+    prompt.add_rows(
+        [encode_transaction(row) for row in transactions],
+        omitted="... {count} smaller transactions not shown (they are included in the totals above)"
+    )
+    return prompt
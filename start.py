@@ -21,7 +21,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=port,
-        workers=1,  # Single worker for Railway
+        # Extra workers share chat history/dedup through the SQLite state backend
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
         log_level="info",
         access_log=True,
         reload=False  # Disable reload in production
@@ -0,0 +1,325 @@
+"""
+Pluggable storage for per-user conversation state (chat history, rolling summary and message dedup)
+
+The in-memory backend is fastest but private to one process. The SQLite backend
+keeps state in a WAL-mode database file that several uvicorn worker processes
+can share, so the server can run with more than one worker.
+"""
+
+import asyncio
+import json
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from langchain_core.messages import HumanMessage, AIMessage
+
+from dedup_store import MessageDeduplicator
+
+_ROLE_BY_TYPE = {HumanMessage: "human", AIMessage: "ai"}
+_TYPE_BY_ROLE = {"human": HumanMessage, "ai": AIMessage}
+
+# Rough per-object overheads used for the in-memory store's byte accounting
+MESSAGE_OVERHEAD_BYTES = 64
+CONVERSATION_OVERHEAD_BYTES = 1024
+
+
+class _Conversation:
+    """One user's resident state: a ring buffer of (role, content) pairs plus the rolling summary"""
+
+    __slots__ = ("messages", "summary", "last_used", "bytes")
+
+    def __init__(self, max_history_length: int):
+        self.messages = deque(maxlen=max_history_length)
+        self.summary = None
+        self.last_used = time.monotonic()
+        self.bytes = CONVERSATION_OVERHEAD_BYTES
+
+
+def _message_bytes(content: str) -> int:
+    return sys.getsizeof(content) + MESSAGE_OVERHEAD_BYTES
+
+
+def _summary_bytes(summary) -> int:
+    return len(json.dumps(summary, default=str)) if summary else 0
+
+
+class InMemoryStateBackend:
+    """
+    Chat history and summaries kept inside this process, with bounded memory.
+
+    Each user gets a fixed-size ring buffer of (role, content) pairs. Conversations
+    idle for longer than idle_ttl are dropped, and the least recently used ones are
+    evicted whenever more than max_users are resident or their approximate size
+    exceeds max_bytes.
+    """
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_history_length: int = 20, max_users: int = 10000, idle_ttl: float = 86400,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.max_history_length = max_history_length
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self._conversations = OrderedDict()  # user_id -> _Conversation, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.evictions = 0
+        self.expirations = 0
+
+    def _touch(self, user_id: int, create: bool = False):
+        """The user's conversation marked as just used (created if asked), after dropping idle ones"""
+        now = time.monotonic()
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            if now - oldest.last_used <= self.idle_ttl:
+                break
+            self._drop(oldest_id)
+            self.expirations += 1
+
+        conversation = self._conversations.get(user_id)
+        if conversation is None:
+            if not create:
+                return None
+            conversation = self._conversations[user_id] = _Conversation(self.max_history_length)
+            self._bytes += conversation.bytes
+        conversation.last_used = now
+        self._conversations.move_to_end(user_id)
+        return conversation
+
+    def _drop(self, user_id: int):
+        conversation = self._conversations.pop(user_id, None)
+        if conversation is not None:
+            self._bytes -= conversation.bytes
+        return conversation
+
+    def _resize(self, conversation: _Conversation, delta: int):
+        conversation.bytes += delta
+        self._bytes += delta
+        # Evict least recently used conversations, never the one just written (it is last)
+        while len(self._conversations) > 1 and (
+            len(self._conversations) > self.max_users or self._bytes > self.max_bytes
+        ):
+            self._drop(next(iter(self._conversations)))
+            self.evictions += 1
+
+    def get_chat_history(self, user_id: int) -> list:
+        with self._lock:
+            conversation = self._touch(user_id)
+            messages = list(conversation.messages) if conversation else []
+        return [_TYPE_BY_ROLE[role](content=content) for role, content in messages]
+
+    def append_chat_message(self, user_id: int, message):
+        role = _ROLE_BY_TYPE.get(type(message))
+        if role is None:
+            return
+        with self._lock:
+            conversation = self._touch(user_id, create=True)
+            delta = _message_bytes(message.content)
+            if len(conversation.messages) == conversation.messages.maxlen:
+                delta -= _message_bytes(conversation.messages[0][1])
+            conversation.messages.append((role, message.content))
+            self._resize(conversation, delta)
+
+    def clear_chat_history(self, user_id: int) -> bool:
+        with self._lock:
+            conversation = self._drop(user_id)
+        return conversation is not None and bool(conversation.messages or conversation.summary)
+
+    def get_conversation_summary(self, user_id: int) -> dict:
+        with self._lock:
+            conversation = self._touch(user_id)
+            return dict(conversation.summary or {}) if conversation else {}
+
+    def set_conversation_summary(self, user_id: int, summary: dict):
+        with self._lock:
+            conversation = self._touch(user_id, create=True)
+            delta = _summary_bytes(summary) - _summary_bytes(conversation.summary)
+            conversation.summary = summary
+            self._resize(conversation, delta)
+
+    def stats(self) -> dict:
+        return {
+            "conversations": len(self._conversations),
+            "max_users": self.max_users,
+            "approx_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    @asynccontextmanager
+    async def user_lease(self, key):
+        # A single process: MessageQueue already runs one user's messages one at a time
+        yield
+
+    def create_deduplicator(self, max_size: int, ttl_seconds: float, db_path: str = None) -> MessageDeduplicator:
+        return MessageDeduplicator(max_size=max_size, ttl_seconds=ttl_seconds, db_path=db_path)
+
+    def close(self):
+        pass
+
+
+class SQLiteStateBackend:
+    """Chat history stored in a shared SQLite (WAL) database file"""
+
+    name = "sqlite"
+    # Calls may wait on file locks held by other worker processes; async callers run them in a thread
+    blocking = True
+
+    def __init__(self, db_path: str, max_history_length: int = 20, lease_ttl: float = 120,
+                 lease_poll_interval: float = 0.05):
+        self.db_path = db_path
+        self.max_history_length = max_history_length
+        self.lease_ttl = lease_ttl
+        self.lease_poll_interval = lease_poll_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "user_id INTEGER NOT NULL, "
+            "role TEXT NOT NULL, "
+            "content TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_chat_messages_user_id ON chat_messages (user_id, id)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_summaries ("
+            "user_id INTEGER PRIMARY KEY, "
+            "summary TEXT NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_leases ("
+            "lease_key TEXT PRIMARY KEY, "
+            "owner TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_chat_history(self, user_id: int) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM ("
+                "SELECT id, role, content FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT ?"
+                ") ORDER BY id",
+                (user_id, self.max_history_length)
+            ).fetchall()
+        return [_TYPE_BY_ROLE[role](content=content) for role, content in rows if role in _TYPE_BY_ROLE]
+
+    def append_chat_message(self, user_id: int, message):
+        role = _ROLE_BY_TYPE.get(type(message))
+        if role is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO chat_messages (user_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, role, message.content, time.time())
+            )
+            # Trim to the newest max_history_length messages for this user
+            self._conn.execute(
+                "DELETE FROM chat_messages WHERE user_id = ? AND id <= ("
+                "SELECT id FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (user_id, user_id, self.max_history_length)
+            )
+            self._conn.commit()
+
+    def clear_chat_history(self, user_id: int) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM chat_messages WHERE user_id = ?", (user_id,))
+            cleared = cursor.rowcount
+            cursor = self._conn.execute("DELETE FROM conversation_summaries WHERE user_id = ?", (user_id,))
+            cleared += cursor.rowcount
+            self._conn.commit()
+        return cleared > 0
+
+    def get_conversation_summary(self, user_id: int) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM conversation_summaries WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set_conversation_summary(self, user_id: int, summary: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO conversation_summaries (user_id, summary, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET summary = excluded.summary, updated_at = excluded.updated_at",
+                (user_id, json.dumps(summary, default=str), time.time())
+            )
+            self._conn.commit()
+
+    def _try_lease(self, key: str, owner: str) -> bool:
+        """Take key's lease if it is free or expired; returns False while another owner holds it"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO user_leases (lease_key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(lease_key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE user_leases.expires_at < ?",
+                (key, owner, now + self.lease_ttl, now)
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def _release_lease(self, key: str, owner: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM user_leases WHERE lease_key = ? AND owner = ?", (key, owner))
+            self._conn.commit()
+
+    @asynccontextmanager
+    async def user_lease(self, key):
+        """
+        Hold key's lease in the shared database so one user's messages never run at the same
+        time in two worker processes. Waits while another process holds it; a lease left by a
+        crashed worker expires after lease_ttl seconds.
+        """
+        if key is None:
+            yield
+            return
+        key, owner = str(key), uuid.uuid4().hex
+        while not await asyncio.to_thread(self._try_lease, key, owner):
+            await asyncio.sleep(self.lease_poll_interval)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self._release_lease, key, owner)
+
+    def stats(self) -> dict:
+        with self._lock:
+            conversations, approx_bytes = self._conn.execute(
+                "SELECT COUNT(DISTINCT user_id), COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM chat_messages"
+            ).fetchone()
+        return {"conversations": conversations, "approx_bytes": approx_bytes}
+
+    def create_deduplicator(self, max_size: int, ttl_seconds: float, db_path: str = None) -> MessageDeduplicator:
+        # Always share the state database so every worker process sees the same message IDs
+        return MessageDeduplicator(max_size=max_size, ttl_seconds=ttl_seconds, db_path=self.db_path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_state_backend(kind: str, db_path: str = None, max_history_length: int = 20, lease_ttl: float = 120,
+                         **memory_limits):
+    """Build the configured state backend ("memory" or "sqlite"); memory_limits go to InMemoryStateBackend"""
+    if kind == "memory":
+        return InMemoryStateBackend(max_history_length=max_history_length, **memory_limits)
+    if kind == "sqlite":
+        return SQLiteStateBackend(db_path, max_history_length=max_history_length, lease_ttl=lease_ttl)
+    raise ValueError(f"Unknown state backend: {kind}")
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# The database modules bind their engines at import time, so point them at a scratch file first
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'financial_bot.db')}"
+os.environ.setdefault("GEMINI_API_KEY", "test")
@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+
+from fast_intent_classifier import FastIntentClassifier
+
+TODAY = date(2025, 1, 15)
+
+
+def classify(message):
+    return FastIntentClassifier(min_confidence=0.85).classify(message, TODAY)
+
+
+@pytest.mark.parametrize("message, amount", [
+    ("spent 500 on groceries", 500),
+    ("spent 5k on groceries", 5000),
+    ("spent 5 k on groceries", 5000),
+    ("paid 2 lakh rent", 200000),
+    ("paid 2 lakhs rent", 200000),
+    ("paid 3 lac rent", 300000),
+    ("spent 1.5L on shopping", 150000),
+    ("spent 1.1 lakh on shopping", 110000),
+    ("paid 2 cr rent", 20000000),
+    ("paid 1.25 crore rent", 12500000),
+    ("spent 12 thousand on groceries", 12000),
+    ("paid rs 1,200 for groceries", 1200),
+    ("spent 99.5 on coffee", 99.5),
+])
+def test_amount_scale_suffixes(message, amount):
+    result = classify(message)
+    assert result is not None
+    assert result["transactions"][0]["amount"] == amount
+
+
+@pytest.mark.parametrize("message", ["spent 5kg on vegetables", "bought 2pcs shirt"])
+def test_other_units_go_to_the_llm(message):
+    # "kg" is not a thousand multiplier, and a quantity is not an amount of money
+    assert classify(message) is None
+
+
+def test_rupee_suffix_is_still_an_amount():
+    assert classify("spent 500rs on groceries")["transactions"][0]["amount"] == 500
+
+
+@pytest.mark.parametrize("message, transaction_date", [
+    ("spent 500 on groceries", "2025-01-15"),
+    ("spent 500 on groceries today", "2025-01-15"),
+    ("spent 500 on groceries yesterday", "2025-01-14"),
+    ("paid rs 80 for auto yesterday", "2025-01-14"),
+])
+def test_bare_today_and_yesterday_are_resolved(message, transaction_date):
+    assert classify(message)["transactions"][0]["transaction_date"] == transaction_date
+
+
+@pytest.mark.parametrize("message", [
+    "spent 500 on groceries day before yesterday",
+    "spent 500 on groceries in december",
+    "spent 500 on groceries in dec",
+    "spent 500 on groceries over the weekend",
+    "paid 500 for dinner on sat",
+    "spent 100 on tea yday",
+    "spent 500 on shopping on diwali",
+    "paid rent 15000 for march",
+    "spent 200 on coffee earlier",
+    "spent 300 on lunch last week",
+    "spent 500 on groceries yesterday and today",
+])
+def test_other_time_phrases_go_to_the_llm(message):
+    assert classify(message) is None
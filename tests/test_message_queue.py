@@ -0,0 +1,86 @@
+import asyncio
+
+from message_queue import MessageQueue
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_jobs_with_the_same_key_run_in_order():
+    async def scenario():
+        queue = MessageQueue(num_workers=4)
+        await queue.start()
+        finished = []
+
+        async def job(name, delay):
+            await asyncio.sleep(delay)
+            finished.append(name)
+
+        # Later messages are quicker, so any overlap would finish them first
+        for i, delay in enumerate([0.05, 0.02, 0.0, 0.01]):
+            assert queue.enqueue(job, f"chai-{i}", delay, key="+910000000001")
+        await queue.stop()
+        return finished
+
+    assert run(scenario()) == ["chai-0", "chai-1", "chai-2", "chai-3"]
+
+
+def test_jobs_with_the_same_key_never_overlap():
+    async def scenario():
+        queue = MessageQueue(num_workers=4, jobs_per_turn=2)
+        await queue.start()
+        running = {"now": 0, "max": 0}
+
+        async def job():
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.005)
+            running["now"] -= 1
+
+        for _ in range(6):
+            queue.enqueue(job, key="+910000000001")
+        await queue.stop()
+        return running["max"], queue.processed
+
+    assert run(scenario()) == (1, 6)
+
+
+def test_different_keys_run_in_parallel():
+    async def scenario():
+        queue = MessageQueue(num_workers=2)
+        await queue.start()
+        both_started = asyncio.Event()
+        started = []
+
+        async def job(key):
+            started.append(key)
+            if len(started) == 2:
+                both_started.set()
+            # Only finishes if the other user's job started while this one was running
+            await asyncio.wait_for(both_started.wait(), timeout=1)
+
+        queue.enqueue(job, "a", key="a")
+        queue.enqueue(job, "b", key="b")
+        await queue.stop()
+        return queue.processed, queue.failed
+
+    assert run(scenario()) == (2, 0)
+
+
+def test_per_key_limit_drops_extra_jobs():
+    async def scenario():
+        queue = MessageQueue(num_workers=1, max_pending_per_key=2)
+        await queue.start()
+        gate = asyncio.Event()
+
+        async def job():
+            await gate.wait()
+
+        accepted = [queue.enqueue(job, key="a") for _ in range(3)]
+        other = queue.enqueue(job, key="b")
+        gate.set()
+        await queue.stop()
+        return accepted, other, queue.dropped
+
+    assert run(scenario()) == ([True, True, False], True, 1)
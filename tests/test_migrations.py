@@ -0,0 +1,115 @@
+from sqlalchemy import create_engine, text
+
+from add_data_in_database import Base
+from migrations import MIGRATIONS, run_migrations
+
+# user_interactions as the first release created it: decimal rupees and category names inline
+BASELINE_SCHEMA = [
+    "CREATE TABLE users ("
+    "user_id INTEGER PRIMARY KEY AUTOINCREMENT, whatsapp_number VARCHAR(20) NOT NULL UNIQUE, "
+    "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE user_interactions ("
+    "interaction_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL REFERENCES users (user_id), "
+    "message_text TEXT NOT NULL, transaction_type VARCHAR(6), amount DECIMAL(12, 2), "
+    "category_name VARCHAR(100), subcategory_name VARCHAR(100), transaction_date DATE, "
+    "processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+]
+
+BASELINE_ROWS = [
+    # interaction_id, message_text, transaction_type, amount, category, subcategory, date, processed_at
+    (7, "coffee at starbucks 19.99", "Debit", 19.99, "Food", "Coffee", "2025-01-02", "2025-01-02 09:00:00"),
+    (9, "spent 200 on swiggy and 80 on auto", "Debit", 200, "Food", "Swiggy", "2025-01-03", "2025-01-03 13:00:00"),
+    (10, "spent 200 on swiggy and 80 on auto", "Debit", 80, "Transport", "Auto", "2025-01-03", "2025-01-03 13:00:00"),
+    (12, "salary 50000.5", "Credit", 50000.5, "Income", "Salary", "2025-01-05", "2025-01-05 10:00:00"),
+    (15, "misc 12.5", "Debit", 12.5, None, None, "2025-02-01", "2025-02-01 10:00:00"),
+]
+
+
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO users (user_id, whatsapp_number) VALUES (1, '+910000000001')"))
+        for row in BASELINE_ROWS:
+            conn.execute(text(
+                "INSERT INTO user_interactions (interaction_id, user_id, message_text, transaction_type, amount, "
+                "category_name, subcategory_name, transaction_date, processed_at) "
+                "VALUES (:id, 1, :message, :type, :amount, :category, :subcategory, :date, :processed_at)"
+            ), dict(zip(("id", "message", "type", "amount", "category", "subcategory", "date", "processed_at"), row)))
+    return engine
+
+
+def migrate(tmp_path):
+    # The same steps as create_tables(), against the legacy file
+    engine = baseline_engine(tmp_path)
+    Base.metadata.create_all(engine)
+    version = run_migrations(engine)
+    return engine, version
+
+
+def test_baseline_database_reaches_latest_version(tmp_path):
+    engine, version = migrate(tmp_path)
+
+    assert version == MIGRATIONS[-1][0]
+    with engine.connect() as conn:
+        applied = conn.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+        legacy = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE name = 'user_interactions_legacy'"
+        )).first()
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    assert legacy is None
+
+
+def test_amounts_become_paise_and_ids_are_kept(tmp_path):
+    engine, _ = migrate(tmp_path)
+
+    with engine.connect() as conn:
+        amounts = dict(conn.execute(text(
+            "SELECT interaction_id, amount_paise FROM user_interactions ORDER BY interaction_id"
+        )).all())
+    # 19.99 * 100 is 1998.9999... in floating point; rounding must not truncate it to 1998
+    assert amounts == {7: 1999, 9: 20000, 10: 8000, 12: 5000050, 15: 1250}
+
+
+def test_category_names_are_interned(tmp_path):
+    engine, _ = migrate(tmp_path)
+
+    with engine.connect() as conn:
+        categories = conn.execute(text("SELECT name FROM categories ORDER BY name")).scalars().all()
+        rows = dict(conn.execute(text(
+            "SELECT i.interaction_id, c.name || '/' || s.name FROM user_interactions i "
+            "LEFT JOIN categories c ON c.category_id = i.category_id "
+            "LEFT JOIN subcategories s ON s.subcategory_id = i.subcategory_id"
+        )).all())
+    assert categories == ["Food", "Income", "Transport"]
+    assert rows == {7: "Food/Coffee", 9: "Food/Swiggy", 10: "Transport/Auto", 12: "Income/Salary", 15: None}
+
+
+def test_rollups_and_search_index_are_backfilled(tmp_path):
+    engine, _ = migrate(tmp_path)
+
+    with engine.connect() as conn:
+        monthly = dict(conn.execute(text(
+            "SELECT transaction_type, SUM(total_paise) FROM interaction_rollups "
+            "WHERE period = 'month' AND period_start = '2025-01-01' GROUP BY transaction_type"
+        )).all())
+        matches = conn.execute(text(
+            "SELECT rowid FROM interaction_search WHERE interaction_search MATCH 'starbucks OR auto' ORDER BY rowid"
+        )).scalars().all()
+        counts = dict(conn.execute(text(
+            "SELECT interaction_id, message_transaction_count FROM user_interactions"
+        )).all())
+    assert monthly == {"Debit": 1999 + 20000 + 8000, "Credit": 5000050}
+    # "auto" is in the shared message text of 9 and 10 and the subcategory of 10
+    assert matches == [7, 9, 10]
+    # Legacy rows cannot be grouped by message reliably, so each counts as its own message
+    assert counts == {7: 1, 9: 1, 10: 1, 12: 1, 15: 1}
+
+
+def test_migrations_are_not_reapplied(tmp_path):
+    engine, version = migrate(tmp_path)
+
+    assert run_migrations(engine) == version
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM user_interactions")).scalar() == len(BASELINE_ROWS)
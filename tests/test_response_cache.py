@@ -0,0 +1,82 @@
+import asyncio
+
+from response_cache import TTLCache
+
+
+def test_zero_ttl_disables_caching():
+    cache = TTLCache(max_size=10, default_ttl=0)
+    calls = []
+    loader = lambda: calls.append(1) or len(calls)
+
+    assert cache.get_or_load("totals", loader) == 1
+    assert cache.get_or_load("totals", loader) == 2
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidate_where_drops_one_users_entries():
+    cache = TTLCache(max_size=10, default_ttl=60)
+    cache.set(("summary", 1, "2025-01-01"), "a")
+    cache.set(("summary", 2, "2025-01-01"), "b")
+
+    assert cache.invalidate_where(lambda key: key[1] == 1) == 1
+    assert cache.get(("summary", 1, "2025-01-01")) is None
+    assert cache.get(("summary", 2, "2025-01-01")) == "b"
+
+
+def test_concurrent_identical_queries_share_one_load():
+    cache = TTLCache(max_size=10, default_ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "gold is ₹7,000/g"
+
+    async def run():
+        return await asyncio.gather(*(cache.aget_or_load("gold rate", loader) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["gold is ₹7,000/g"] * 10
+    assert len(calls) == 1
+    assert (cache.stats()["misses"], cache.stats()["coalesced"], cache.stats()["inflight"]) == (1, 9, 0)
+    # Later callers are served from the cache
+    assert asyncio.run(cache.aget_or_load("gold rate", loader)) == "gold is ₹7,000/g"
+    assert len(calls) == 1
+
+
+def test_failed_load_is_shared_but_not_cached():
+    cache = TTLCache(max_size=10, default_ttl=60)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exceeded")
+
+    async def run():
+        return await asyncio.gather(*(cache.aget_or_load("gold rate", failing) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.stats()["size"] == 0
+
+    async def working():
+        calls.append(1)
+        return "gold is ₹7,000/g"
+
+    assert asyncio.run(cache.aget_or_load("gold rate", working)) == "gold is ₹7,000/g"
+    assert len(calls) == 2
+
+
+def test_empty_answers_are_not_cached():
+    cache = TTLCache(max_size=10, default_ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return None
+
+    for _ in range(2):
+        assert asyncio.run(cache.aget_or_load("gold rate", loader)) is None
+    assert len(calls) == 2
@@ -0,0 +1,124 @@
+import random
+from datetime import date, timedelta
+from itertools import count
+
+import pytest
+from sqlalchemy import select
+
+from add_data_in_database import (
+    engine, create_tables, add_user, add_interactions_batch, get_user_financial_summary, rebuild_rollups,
+    InteractionRollup, TransactionType
+)
+
+FIRST_DAY = date(2024, 11, 20)
+LAST_DAY = date(2025, 3, 10)
+CATEGORIES = ["Food", "Transport", "Housing", None]
+
+_numbers = count()
+
+
+def random_rows(rng, total):
+    rows = []
+    for _ in range(total):
+        credit = rng.random() < 0.2
+        rows.append({
+            "message_text": "loaded",
+            "transaction_type": TransactionType.Credit if credit else TransactionType.Debit,
+            "amount": round(rng.uniform(1, 5000), 2),
+            "category_name": "Income" if credit else rng.choice(CATEGORIES),
+            "subcategory_name": None,
+            "transaction_date": FIRST_DAY + timedelta(days=rng.randrange((LAST_DAY - FIRST_DAY).days + 1)),
+        })
+    return rows
+
+
+@pytest.fixture(scope="module")
+def history():
+    """A user with transactions spread over several month boundaries, and the raw rows"""
+    create_tables()
+    user_id = add_user(f"+9188800{next(_numbers):05d}")
+    rng = random.Random(15)
+    rows = random_rows(rng, 400)
+    # Month edges get their own rows so every boundary is exercised
+    for day in (date(2024, 11, 30), date(2024, 12, 1), date(2024, 12, 31), date(2025, 1, 1),
+                date(2025, 1, 31), date(2025, 2, 1), date(2025, 2, 28), date(2025, 3, 1)):
+        for row in random_rows(rng, 2):
+            rows.append({**row, "transaction_date": day})
+    # Several batches, so the incremental upserts add to existing rollup rows
+    for offset in range(0, len(rows), 50):
+        assert add_interactions_batch(user_id, rows[offset:offset + 50]) == len(rows[offset:offset + 50])
+    return user_id, rows
+
+
+def raw_summary(rows, start_date, end_date, transaction_type=None):
+    """Totals summed straight from the rows, in paise"""
+    expenses = income = transactions = 0
+    breakdown = {}
+    for row in rows:
+        if not start_date <= row["transaction_date"] <= end_date:
+            continue
+        if transaction_type and row["transaction_type"].value != transaction_type:
+            continue
+        paise = round(row["amount"] * 100)
+        transactions += 1
+        if row["transaction_type"] == TransactionType.Debit:
+            expenses += paise
+            category = row["category_name"] or "Uncategorized"
+            breakdown[category] = breakdown.get(category, 0) + paise
+        else:
+            income += paise
+    return expenses, income, transactions, breakdown
+
+
+def assert_matches_raw(user_id, rows, start_date, end_date, transaction_type=None):
+    summary = get_user_financial_summary(user_id, start_date, end_date, transaction_type)
+    expenses, income, transactions, breakdown = raw_summary(rows, start_date, end_date, transaction_type)
+    assert round(summary["total_expenses"] * 100) == expenses
+    assert round(summary["total_income"] * 100) == income
+    assert summary["transaction_count"] == transactions
+    assert {category: round(amount * 100) for category, amount in summary["category_breakdown"].items()} == breakdown
+
+
+@pytest.mark.parametrize("start_date, end_date", [
+    (date(2025, 1, 15), date(2025, 1, 15)),  # one day
+    (date(2025, 1, 1), date(2025, 1, 31)),  # exactly one month
+    (date(2025, 2, 1), date(2025, 2, 28)),  # a short month
+    (date(2025, 1, 2), date(2025, 1, 30)),  # inside one month, no whole month
+    (date(2025, 1, 31), date(2025, 2, 1)),  # two days across a boundary
+    (date(2024, 12, 1), date(2025, 2, 28)),  # whole months only, across a year
+    (date(2024, 11, 30), date(2025, 3, 1)),  # whole months plus one day at each end
+    (date(2024, 12, 15), date(2025, 2, 14)),  # partial months at both ends
+    (date(2024, 12, 31), date(2025, 1, 31)),  # one leftover day then a whole month
+    (date(2024, 1, 1), date(2026, 1, 1)),  # wider than the data
+])
+def test_rollup_totals_match_raw_rows(history, start_date, end_date):
+    user_id, rows = history
+    assert_matches_raw(user_id, rows, start_date, end_date)
+
+
+def test_random_ranges_match_raw_rows(history):
+    user_id, rows = history
+    rng = random.Random(42)
+    span = (LAST_DAY - FIRST_DAY).days
+    for _ in range(100):
+        start_date = FIRST_DAY + timedelta(days=rng.randrange(span))
+        end_date = start_date + timedelta(days=rng.randrange(span))
+        assert_matches_raw(user_id, rows, start_date, end_date, rng.choice([None, "Debit", "Credit"]))
+
+
+def test_rebuild_matches_incremental_rollups(history):
+    user_id, _ = history
+    query = (
+        select(InteractionRollup)
+        .where(InteractionRollup.user_id == user_id)
+        .order_by(*InteractionRollup.__table__.primary_key.columns)
+    )
+
+    def snapshot():
+        with engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(query).all()]
+
+    before = snapshot()
+    assert before
+    rebuild_rollups(user_id=user_id)
+    assert snapshot() == before
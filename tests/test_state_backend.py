@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage, AIMessage
+
+import state_backend
+from state_backend import (
+    InMemoryStateBackend, SQLiteStateBackend, CONVERSATION_OVERHEAD_BYTES, _message_bytes
+)
+
+
+def test_user_lease_serializes_across_backends(tmp_path):
+    # Two backends on one file stand in for two uvicorn worker processes
+    db_path = str(tmp_path / "state.db")
+    workers = [SQLiteStateBackend(db_path, lease_poll_interval=0.01) for _ in range(2)]
+    events = []
+
+    async def handle(backend, name):
+        async with backend.user_lease("+911234567890"):
+            events.append(("start", name))
+            await asyncio.sleep(0.05)
+            events.append(("end", name))
+
+    async def run():
+        await asyncio.gather(handle(workers[0], "chai"), handle(workers[1], "what did I spend"))
+
+    asyncio.run(run())
+    for backend in workers:
+        backend.close()
+
+    assert [kind for kind, _ in events] == ["start", "end", "start", "end"]
+    assert events[0][1] == events[1][1]
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    backend = SQLiteStateBackend(str(tmp_path / "state.db"), lease_ttl=-1)
+    assert backend._try_lease("user", "crashed-worker")
+    assert backend._try_lease("user", "next-worker")
+    backend.close()
+
+
+def test_other_users_are_not_blocked(tmp_path):
+    backend = SQLiteStateBackend(str(tmp_path / "state.db"))
+    assert backend._try_lease("alice", "worker-1")
+    assert not backend._try_lease("alice", "worker-2")
+    assert backend._try_lease("bob", "worker-2")
+    backend.close()
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(state_backend.time, "monotonic", clock)
+    return clock
+
+
+def contents(backend, user_id):
+    return [message.content for message in backend.get_chat_history(user_id)]
+
+
+def test_chat_history_keeps_only_the_latest_messages():
+    backend = InMemoryStateBackend(max_history_length=3)
+    for i in range(5):
+        backend.append_chat_message(1, HumanMessage(content=f"m{i}") if i % 2 == 0 else AIMessage(content=f"m{i}"))
+
+    assert contents(backend, 1) == ["m2", "m3", "m4"]
+    assert [type(message) for message in backend.get_chat_history(1)] == [HumanMessage, AIMessage, HumanMessage]
+
+
+def test_byte_count_drops_when_a_message_is_pushed_out():
+    backend = InMemoryStateBackend(max_history_length=2)
+    long_message, short_message = "x" * 1000, "ok"
+    backend.append_chat_message(1, HumanMessage(content=long_message))
+    backend.append_chat_message(1, AIMessage(content=long_message))
+    full = backend.stats()["approx_bytes"]
+
+    backend.append_chat_message(1, HumanMessage(content=short_message))
+
+    assert backend.stats()["approx_bytes"] < full
+    assert backend.stats()["approx_bytes"] == (
+        CONVERSATION_OVERHEAD_BYTES + _message_bytes(long_message) + _message_bytes(short_message)
+    )
+
+
+def test_idle_conversations_expire(clock):
+    backend = InMemoryStateBackend(idle_ttl=60)
+    backend.append_chat_message(1, HumanMessage(content="chai 20"))
+    backend.set_conversation_summary(1, {"turns": 1})
+
+    clock.now += 61
+    backend.append_chat_message(2, HumanMessage(content="hi"))
+
+    assert backend.expirations == 1
+    assert contents(backend, 1) == []
+    assert backend.get_conversation_summary(1) == {}
+    assert contents(backend, 2) == ["hi"]
+
+
+def test_least_recently_used_user_is_evicted_past_max_users():
+    backend = InMemoryStateBackend(max_users=2)
+    backend.append_chat_message(1, HumanMessage(content="one"))
+    backend.append_chat_message(2, HumanMessage(content="two"))
+    contents(backend, 1)  # user 1 is now the most recently used
+
+    backend.append_chat_message(3, HumanMessage(content="three"))
+
+    assert backend.evictions == 1
+    assert contents(backend, 1) == ["one"]
+    assert contents(backend, 2) == []
+    assert contents(backend, 3) == ["three"]
+
+
+def test_users_are_evicted_past_max_bytes():
+    message = "x" * 100
+    per_user = CONVERSATION_OVERHEAD_BYTES + _message_bytes(message)
+    backend = InMemoryStateBackend(max_bytes=2 * per_user)
+    for user_id in (1, 2, 3):
+        backend.append_chat_message(user_id, HumanMessage(content=message))
+
+    assert backend.evictions == 1
+    assert backend.stats()["conversations"] == 2
+    assert backend.stats()["approx_bytes"] == 2 * per_user
+    assert contents(backend, 1) == []
@@ -0,0 +1,58 @@
+from datetime import date
+from itertools import count
+
+import pytest
+
+from add_data_in_database import (
+    create_tables, add_user, add_interactions_batch, search_user_transactions, summarize_transaction_rows,
+    TransactionType
+)
+
+_numbers = count()
+
+
+@pytest.fixture
+def user_id():
+    create_tables()
+    return add_user(f"+9100000{next(_numbers):05d}")
+
+
+def debit(message_text, amount, category_name, subcategory_name, day=2):
+    return {
+        "message_text": message_text, "transaction_type": TransactionType.Debit, "amount": amount,
+        "category_name": category_name, "subcategory_name": subcategory_name,
+        "transaction_date": date(2025, 1, day),
+    }
+
+
+def search_total(user_id, search_text):
+    rows = search_user_transactions(user_id, search_text, "2025-01-01", "2025-01-31")
+    return summarize_transaction_rows(rows, "2025-01-01", "2025-01-31")["total_expenses"]
+
+
+def test_other_items_from_the_same_message_do_not_match(user_id):
+    message = "spent 200 on starbucks and 80 on auto"
+    add_interactions_batch(user_id, [
+        debit(message, 200, "Food", "Starbucks"),
+        debit(message, 80, "Transport", "Auto"),
+    ], from_one_message=True)
+
+    assert search_total(user_id, "starbucks") == 200
+    assert search_total(user_id, "auto") == 80
+
+
+def test_single_transaction_messages_match_on_their_text(user_id):
+    add_interactions_batch(user_id, [debit("coffee at Starbucks 250", 250, "Food", "Coffee")])
+    add_interactions_batch(user_id, [debit("starbucks 120 and 60 on metro", 120, "Food", "Coffee", day=3),
+                                     debit("starbucks 120 and 60 on metro", 60, "Transport", "Metro", day=3)],
+                          from_one_message=True)
+
+    # The shared message is ambiguous, so only the single-transaction message counts
+    assert search_total(user_id, "starbuck") == 250
+
+
+def test_bulk_loaded_rows_with_the_same_text_all_match(user_id):
+    # Separate messages that happen to read the same, loaded in one batch
+    add_interactions_batch(user_id, [debit("chai 20", 20, "Food", "Tea", day=day) for day in (4, 5, 6)])
+
+    assert search_total(user_id, "chai") == 60
@@ -1,7 +1,7 @@
 # file: transaction_history.py
 
-import json
 from add_data_in_database import get_user_financial_data
+from prompt_builder import PromptBuilder, add_financial_data
 
 class TransactionHistory:
     """
@@ -23,7 +23,8 @@ class TransactionHistory:
         if user_data.get('error'):
             return "Sorry, I couldn't find any data for your account."
 
-        prompt = f"""
+        prompt = PromptBuilder("history_report")
+        prompt.add(f"""
         You are FinBot, a sassy financial advisor who has access to this user's financial history. 
         You're like that friend who remembers EVERYTHING about someone's spending and isn't afraid to bring it up.
 
@@ -35,8 +36,9 @@ class TransactionHistory:
         USER QUERY: "{query}"
 
         USER'S FINANCIAL DATA (Last 7 days):
-        {json.dumps(user_data, indent=2, default=str)}
-
+""")
+        add_financial_data(prompt, user_data)
+        prompt.add("""
         🎯 RESPONSE GUIDELINES:
         1. Answer their specific question using the actual data.
         2. Reference specific transactions or categories if relevant (e.g., "Remember that ₹2,499 Amazon splurge? 👀").
@@ -46,10 +48,10 @@ class TransactionHistory:
         6. Be specific, structured, and funny – while being genuinely helpful.
 
         End on a high note with a nudge, joke, or simple advice. Keep it spicy and supportive!
-        """
+        """)
 
         try:
-            response = self.chat_model.invoke(prompt)
+            response = self.chat_model.invoke(prompt.build())
             return response.content
         except Exception as e:
             return f"Oops! I'm having trouble accessing your financial history right now. Error: {str(e)}"
\ No newline at end of file
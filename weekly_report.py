@@ -1,10 +1,10 @@
 # file: weekly_report.py
 
-import json
 from datetime import datetime
 # from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.messages import HumanMessage
 from add_data_in_database import get_user_financial_data
+from prompt_builder import PromptBuilder, add_financial_data
 
 class WeeklyReport:
     """
@@ -28,7 +28,8 @@ class WeeklyReport:
         if not data['transactions']:
             return "Looks like a quiet week! I don't have any transactions to report for the last 7 days. Keep it up!"
 
-        prompt = f"""
+        prompt = PromptBuilder("weekly_report")
+        prompt.add(f"""
 
         You are FinBot, the sassiest financial advisor on the planet! 🤖💸 Think of yourself as that brutally honest friend who roasts your spending habits but genuinely wants you to succeed. You're witty, sarcastic, use pop culture references, and aren't afraid to call out financial nonsense.
 
@@ -37,8 +38,9 @@ class WeeklyReport:
         Generate a weekly financial report based on the following data.
 
         TRANSACTION DATA (Last 7 Days):
-        {json.dumps(data, indent=2, default=str)}
-
+""")
+        add_financial_data(prompt, data)
+        prompt.add("""
         📋 REPORT STRUCTURE (with SASS and CLARITY 🌶️):
         1. 🎭 **SASSY GREETING**: Start with a fun, engaging opening.
         2. 📊 **FINANCIAL REALITY CHECK**:
@@ -53,10 +55,10 @@ class WeeklyReport:
         6. 😎 **SIGN OFF**: End with encouragement and maybe a money pun.
 
         Keep the tone savage but supportive. And format any data or breakdown in a **neat and readable structure**, preferably using a markdown-style table if needed.
-        """
+        """)
         try:
         
-            response = self.chat_model.invoke(prompt)
+            response = self.chat_model.invoke(prompt.build())
             return response.content
             
         except Exception as e: